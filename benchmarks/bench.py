@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""Reader benchmarks.
+
+Times identify_format, the format's read_* function, Trace.to_json
+and Trace.hash on synthetic traces (see synth.py) of each format and
+size, and records the throughput and the peak memory of each stage:
+
+    python benchmarks/bench.py --files 1000 --depths 50 200 500 --spm 10 100
+    python benchmarks/bench.py --compare benchmarks/results/0.0.12-*.json benchmarks/results/0.0.13-*.json
+
+The files are read into memory once and the functions passed the
+bytes (data=...), so the timings are parsing only, not disk I/O.
+Each stage is timed best-of --repeat over all files; the peak memory
+is the tracemalloc peak of one call on one file (measured separately,
+as tracemalloc slows everything down).
+
+The cold-start cost of importing imlresi.trace (in a fresh
+interpreter, best of --repeat) is recorded too, as stage "import".
+
+Results are written to benchmarks/results/<version>-<timestamp>.json
+so that runs from different releases can be compared.
+"""
+
+import argparse
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import ujson as json
+
+from imlresi.trace import Trace, identify_format, read_bin, read_json, read_pdc, read_txt1, read_txt2
+import synth
+
+
+RESULTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+READERS = {
+    'bin': read_bin,
+    'json': read_json,
+    'pdc': read_pdc,
+    'txt1': read_txt1,
+    'txt2': read_txt2,
+}
+
+
+def stages(fmt):
+    """The benchmarked stages, as name -> function of (fn, data, tr)."""
+    return {
+        'identify_format': lambda fn, data, tr: identify_format(fn, data),
+        'read_' + fmt: lambda fn, data, tr: READERS[fmt](fn, data=data),
+        'to_json': lambda fn, data, tr: tr.to_json(),
+        'hash': lambda fn, data, tr: tr.hash(),
+    }
+
+
+def run(fmt, depth_mm, spm, nfiles, repeat=3, tmpdir=None):
+    """Benchmark one format and size. Returns a list of result dicts."""
+    outdir = tempfile.mkdtemp(dir=tmpdir)
+    try:
+        filenames = synth.generate(outdir, fmt, nfiles, depth_mm, spm)
+        files = []
+        for fn in filenames:
+            with open(fn, 'rb') as f:
+                files.append((fn, f.read()))
+    finally:
+        shutil.rmtree(outdir)
+    nbytes = sum(len(data) for _, data in files)
+    traces = []
+    for fn, data in files:
+        tr = Trace()
+        tr.read(fn, data=data)
+        traces.append(tr)
+
+    results = []
+    for stage, func in stages(fmt).items():
+        best = float('inf')
+        for r in range(repeat):
+            t0 = time.perf_counter()
+            for (fn, data), tr in zip(files, traces):
+                func(fn, data, tr)
+            best = min(best, time.perf_counter() - t0)
+
+        fn, data = files[0]
+        tr = traces[0]
+        tracemalloc.start()
+        func(fn, data, tr)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        results.append({
+            'format': fmt,
+            'stage': stage,
+            'depth_mm': depth_mm,
+            'spm': spm,
+            'files': nfiles,
+            'bytes': nbytes,
+            'seconds': best,
+            'files_per_sec': nfiles/best if best else None,
+            'mb_per_sec': nbytes/best/1e6 if best else None,
+            'peak_bytes': peak,
+        })
+    return results
+
+
+def import_time(module='imlresi.trace', repeat=3):
+    """Seconds to import module in a fresh interpreter, over and above
+    starting the interpreter."""
+
+    def best(code):
+        t = float('inf')
+        for r in range(repeat):
+            t0 = time.perf_counter()
+            subprocess.run([sys.executable, '-c', code], check=True)
+            t = min(t, time.perf_counter() - t0)
+        return t
+
+    return max(best('import %s' % module) - best('pass'), 0.)
+
+
+def environment():
+    try:
+        from importlib.metadata import version
+        imlresi_version = version('imlresi')
+    except Exception:
+        imlresi_version = 'unknown'
+    return {
+        'imlresi': imlresi_version,
+        'python': sys.version.split()[0],
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def _key(r):
+    return (r['format'], r['stage'], r['depth_mm'], r['spm'])
+
+
+def compare(old_fn, new_fn, threshold=0.1):
+    """Print new vs old throughput for the runs both have, marking
+    slowdowns of more than threshold. Returns the number of those."""
+    with open(old_fn) as f:
+        old = {_key(r): r for r in json.load(f)['results']}
+    with open(new_fn) as f:
+        new = json.load(f)['results']
+    print('%-6s %-16s %8s %5s %12s %12s %7s' % ('format', 'stage', 'depth', 'spm', 'old files/s', 'new files/s', 'ratio'))
+    slower = 0
+    for r in new:
+        o = old.get(_key(r))
+        if o is None or not o['files_per_sec']:
+            continue
+        ratio = r['files_per_sec']/o['files_per_sec']
+        flag = ''
+        if ratio < 1 - threshold:
+            flag = ' SLOWER'
+            slower += 1
+        print('%-6s %-16s %8s %5s %12.1f %12.1f %7.2f%s' % (
+            r['format'] or '', r['stage'], r['depth_mm'] or '', r['spm'] or '',
+            o['files_per_sec'], r['files_per_sec'], ratio, flag))
+    return slower
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    p.add_argument('--formats', nargs='+', choices=synth.FORMATS, default=list(synth.FORMATS))
+    p.add_argument('--depths', nargs='+', type=float, default=[50., 500.], help='drill depths (mm)')
+    p.add_argument('--spm', nargs='+', type=int, default=[10], help='samples per mm')
+    p.add_argument('--files', type=int, default=100, help='files per format and size')
+    p.add_argument('--repeat', type=int, default=3)
+    p.add_argument('--tmpdir', help='where to write the synthetic files')
+    p.add_argument('--output', help='results file (default: results/<version>-<timestamp>.json)')
+    p.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='compare two results files')
+    args = p.parse_args(argv)
+
+    if args.compare:
+        return 1 if compare(*args.compare) else 0
+
+    env = environment()
+    t = import_time(repeat=max(args.repeat, 5))
+    print('import imlresi.trace: %.1f ms' % (t*1e3))
+    results = [{
+        'format': None,
+        'stage': 'import',
+        'depth_mm': None,
+        'spm': None,
+        'files': 1,
+        'bytes': None,
+        'seconds': t,
+        'files_per_sec': 1/t if t else None,
+        'mb_per_sec': None,
+        'peak_bytes': None,
+    }]
+    for fmt in args.formats:
+        for depth_mm in args.depths:
+            for spm in args.spm:
+                for r in run(fmt, depth_mm, spm, args.files, args.repeat, args.tmpdir):
+                    print('%-6s %-16s %8g mm %4i/mm %10.1f files/s %8.1f MB/s %10i B peak' % (
+                        r['format'], r['stage'], r['depth_mm'], r['spm'],
+                        r['files_per_sec'], r['mb_per_sec'], r['peak_bytes']))
+                    results.append(r)
+
+    fn = args.output or os.path.join(
+        RESULTS, '%s-%s.json' % (env['imlresi'], env['time'].replace(':', '')))
+    os.makedirs(os.path.dirname(os.path.abspath(fn)), exist_ok=True)
+    with open(fn, 'w') as f:
+        json.dump({'environment': env, 'results': results}, f, indent=1)
+    print('results written to %s' % fn)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,185 @@
+"""Synthetic traces, in all five formats, of any depth and resolution.
+
+Each format is generated from one of the real traces in tests/data
+(its header is kept as is) with the drill depth, samples/mm and the
+drill/feed profiles replaced, so the files are as valid as the
+originals:
+
+    from synth import generate
+
+    filenames = generate('/tmp/synth', 'pdc', 1000, depth_mm=500., spm=100)
+
+The profiles are a noisy plateau with a ramp for the bark and, in
+some traces, a dip for decay. All values are whole hundredths, which
+every format can store exactly, so reading a synthetic trace gives
+back exactly the values it was generated from.
+"""
+
+import os
+import re
+from struct import pack
+
+import numpy as np
+import ujson as json
+
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tests', 'data')
+
+TEMPLATES = {
+    'bin': '1-131-withfeed.rgp',
+    'json': '1-131-withfeed-json.rgp',
+    'pdc': '2-178-withfeed.pdc',
+    'txt1': '1-131-withfeed-txt1.txt',
+    'txt2': '1-131-withfeed-txt2.txt',
+}
+
+FORMATS = tuple(TEMPLATES)
+
+EXTENSIONS = {
+    'bin': '.rgp',
+    'json': '.rgp',
+    'pdc': '.pdc',
+    'txt1': '.txt',
+    'txt2': '.txt',
+}
+
+
+def _template(fmt):
+    with open(os.path.join(DATA, TEMPLATES[fmt]), 'rb') as f:
+        return f.read()
+
+
+def profiles(nsamples, spm, feed=True, rng=None):
+    """Synthetic drill (and feed) profiles as uint16 arrays of
+    hundredths. feed is None if feed is False."""
+    if rng is None:
+        rng = np.random.default_rng()
+    t = np.arange(nsamples)
+    # bark: a ramp over the first few mm
+    ramp = np.minimum(1., t/(rng.uniform(2., 10.)*spm))
+    # no wider than the profile, or mode='same' gives a longer one
+    k = max(min(int(spm), nsamples), 1)
+    noise = np.convolve(rng.normal(0., 4., nsamples), np.ones(k)/k, mode='same')
+    drill = ramp*(rng.uniform(15., 45.) + noise)
+    if nsamples and rng.random() < 0.3:
+        # decay
+        a, b = np.sort(rng.integers(0, nsamples, 2))
+        drill[a:b] *= rng.uniform(0., 0.5)
+    drill = np.clip(np.round(drill*100), 0, 0xffff).astype(np.uint16)
+    if not feed:
+        return drill, None
+    noise = np.convolve(rng.normal(0., 2., nsamples), np.ones(k)/k, mode='same')
+    drift = t/max(nsamples, 1)*rng.uniform(-10., 10.)
+    feed = ramp*(rng.uniform(20., 40.) + drift + noise)
+    feed = np.clip(np.round(feed*100), 0, 0xffff).astype(np.uint16)
+    return drill, feed
+
+
+def _hundredths(counts):
+    return ['%.2f' % (c/100) for c in counts.tolist()]
+
+
+def render_bin(depth_mm, spm, drill, feed, template=None):
+    from imlresi.trace import read_bin
+    template = _template('bin') if template is None else template
+    # the template's samples are the rest of the file; its header is
+    # everything before them
+    res = read_bin(None, data=template)
+    raw = bytearray(template[:len(template) - 2*(len(res['drill']) + len(res['feed']))])
+    # skip tooltype .. time (8 strings), the measurement number and
+    # the description to get to the settings block (see read_bin)
+    pos = 0
+    for i in range(8):
+        pos += 1 + raw[pos]
+    pos += 4
+    pos += 1 + raw[pos]
+    raw[pos+9:pos+13] = pack('<I', int(round(depth_mm*10)))
+    raw[pos+21:pos+22] = pack('<B', spm)
+    samples = drill if feed is None else np.concatenate([drill, feed])
+    return bytes(raw) + samples.astype('<u2').tobytes()
+
+
+def render_json(depth_mm, spm, drill, feed, template=None):
+    s = (_template('json') if template is None else template).decode()
+    s = re.sub(r'"depthMsmt": [0-9.]+', '"depthMsmt": %.2f' % (depth_mm/10), s)
+    s = re.sub(r'"resolutionAmp": [0-9]+', '"resolutionAmp": %i' % (spm*1000), s)
+    s = re.sub(r'"drill": \[[^\]]*\]', '"drill": [%s]' % ','.join(_hundredths(drill)), s)
+    feed = _hundredths(feed) if feed is not None else []
+    s = re.sub(r'"feed": \[[^\]]*\]', '"feed": [%s]' % ','.join(feed), s)
+    return s.encode()
+
+
+def render_pdc(depth_mm, spm, drill, feed, template=None):
+    import json as std_json  # for the indented layout
+    J = json.loads(_template('pdc') if template is None else template)
+    J['header']['depthMsmt'] = round(depth_mm/10, 2)
+    J['header']['resolutionAmp'] = spm*1000
+    J['profile']['drill'] = (drill/100).round(2).tolist()
+    J['profile']['feed'] = (feed/100).round(2).tolist() if feed is not None else []
+    return std_json.dumps(J, indent=4, sort_keys=True, ensure_ascii=False).encode()
+
+
+def render_txt1(depth_mm, spm, drill, feed, template=None):
+    lines = (_template('txt1') if template is None else template).decode().split('\n')[:129]
+    lines[8] = '%03d' % spm
+    lines[13] = '%05d' % int(round(depth_mm*10))
+    if feed is None:
+        lines.extend('%05d' % d for d in drill.tolist())
+    else:
+        lines.extend('%05d;%05d' % df for df in zip(drill.tolist(), feed.tolist()))
+    return ('\n'.join(lines) + '\n').encode()
+
+
+def render_txt2(depth_mm, spm, drill, feed, template=None):
+    if feed is None:
+        raise ValueError('txt2 traces always have a feed')
+    lines = (_template('txt2') if template is None else template).decode().split('\n')
+    lines[16] = '%i' % spm
+    lines[21] = '%.2f' % (depth_mm/10)
+    lines[252] = ','.join(_hundredths(drill))
+    lines[253] = ','.join(_hundredths(feed))
+    return '\n'.join(lines).encode()
+
+
+RENDER = {
+    'bin': render_bin,
+    'json': render_json,
+    'pdc': render_pdc,
+    'txt1': render_txt1,
+    'txt2': render_txt2,
+}
+
+
+def _nsamples(depth_mm, spm):
+    tenths = int(round(depth_mm*10))
+    if abs(depth_mm*10 - tenths) > 1e-6:
+        raise ValueError('depth_mm must be a multiple of 0.1, not %r' % depth_mm)
+    if spm != int(spm) or not 1 <= spm <= 255:
+        raise ValueError('spm must be an integer from 1 to 255, not %r' % spm)
+    # as read_bin() works it out to split drill from feed
+    npts = int(spm)*(tenths/10.)
+    if npts != int(npts):
+        raise ValueError('depth_mm*spm must be a whole number of samples, not %r' % npts)
+    return int(npts)
+
+
+def generate(outdir, fmt, nfiles, depth_mm=500., spm=10, feed=True, seed=0):
+    """Write nfiles synthetic traces of format fmt to outdir.
+
+    depth_mm is the drill depth (a multiple of 0.1) and spm the
+    samples per mm (an integer up to 255, the most the binary format
+    can hold); depth_mm*spm, the number of samples, has to be a whole
+    number. Returns the filenames.
+    """
+    nsamples = _nsamples(depth_mm, spm)
+    os.makedirs(outdir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    template = _template(fmt)
+    filenames = []
+    for i in range(nfiles):
+        drill, f = profiles(nsamples, spm, feed, rng)
+        fn = os.path.join(outdir, '%s-%06i%s' % (fmt, i, EXTENSIONS[fmt]))
+        with open(fn, 'wb') as out:
+            out.write(RENDER[fmt](depth_mm, spm, drill, f, template))
+        filenames.append(fn)
+    return filenames
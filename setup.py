@@ -79,13 +79,23 @@ setup(
         # eg:
         #   'rst': ['docutils>=0.11'],
         #   ':python_version=="2.6"': ['argparse'],
+        'numpy': ['numpy'],
+        'parquet': ['pyarrow'],
     },
     setup_requires=[
         'pytest-runner',
     ],
     entry_points={
         'console_scripts': [
-            'nameless = nameless.cli:main',
-        ]
+            'imlresi = imlresi.cli:main',
+        ],
+        # see imlresi/readers.py
+        'imlresi.readers': [
+            'bin = imlresi.trace:read_bin',
+            'json = imlresi.trace:read_json',
+            'pdc = imlresi.trace:read_pdc',
+            'txt1 = imlresi.trace:read_txt1',
+            'txt2 = imlresi.trace:read_txt2',
+        ],
     },
 )
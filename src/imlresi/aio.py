@@ -0,0 +1,123 @@
+"""Reading traces from asyncio code without blocking the event loop.
+
+File I/O is done in a thread and parsing in an executor (the loop's
+default thread pool unless one is given, e.g. a ProcessPoolExecutor
+for CPU-bound bulk parsing), so the loop stays responsive:
+
+    from imlresi.aio import aread, aread_many
+
+    tr = await aread(upload)  # a path, or a (sync or async) stream
+
+    async for res in aread_many(paths, max_in_flight=16):
+        if res.error:
+            ...
+
+aread_many() never has more than max_in_flight files read into memory
+and waiting to be parsed; it only pulls the next item from its input
+(which can be an async iterable, e.g. a queue of uploads) when there
+is room, so a burst of uploads is throttled rather than buffered.
+"""
+
+import asyncio
+from collections import deque
+import inspect
+
+from .batch import ReadResult, _read_one
+from .trace import Trace, as_bytes
+
+
+def _read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+async def read_bytes(path_or_stream):
+    """The bytes of a file or of a stream with a read() method, sync
+    (a file object, BytesIO) or async (an asyncio.StreamReader,
+    aiohttp upload). Files and sync streams are read in a thread."""
+    loop = asyncio.get_running_loop()
+    if hasattr(path_or_stream, 'read'):
+        if inspect.iscoroutinefunction(path_or_stream.read):
+            data = await path_or_stream.read()
+        else:
+            data = await loop.run_in_executor(None, path_or_stream.read)
+            if inspect.isawaitable(data):
+                data = await data
+        return as_bytes(data)
+    return await loop.run_in_executor(None, _read_file, path_or_stream)
+
+
+def _name(path_or_stream):
+    # a stream's name as Trace.read() would take it: its filename, or
+    # None
+    if hasattr(path_or_stream, 'read'):
+        name = getattr(path_or_stream, 'name', None)
+        return name if isinstance(name, str) else None
+    return path_or_stream
+
+
+def _parse(name, data, kwargs):
+    # top level so that it can be pickled for a process pool
+    tr = Trace()
+    tr.read(name, data=data, **kwargs)
+    return tr
+
+
+async def aread(path_or_stream, executor=None, **kwargs):
+    """Read a trace without blocking the event loop. Other keyword
+    arguments are passed to Trace.read()."""
+    data = await read_bytes(path_or_stream)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, _parse, _name(path_or_stream), data, kwargs)
+
+
+async def _read_result(loop, executor, item, kwargs):
+    name = _name(item)
+    try:
+        data = await read_bytes(item)
+    except Exception as err:
+        return ReadResult(name, None, '%s: %s' % (type(err).__name__, err))
+    return await loop.run_in_executor(executor, _read_one, (name, dict(kwargs, data=data)))
+
+
+async def _aiter(items):
+    if hasattr(items, '__aiter__'):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+async def _next_done(pending, ordered):
+    if ordered:
+        return [await pending.popleft()]
+    done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+    for task in done:
+        pending.remove(task)
+    return [task.result() for task in done]
+
+
+async def aread_many(items, max_in_flight=8, executor=None, ordered=True, **kwargs):
+    """Read many traces (paths or streams, from an iterable or async
+    iterable) concurrently, yielding a batch.ReadResult for each.
+
+    At most max_in_flight are being read or parsed at once. If ordered
+    is False results are yielded as they complete rather than in input
+    order. Other keyword arguments are passed to Trace.read().
+    """
+    loop = asyncio.get_running_loop()
+    pending = deque()
+    try:
+        async for item in _aiter(items):
+            pending.append(asyncio.ensure_future(_read_result(loop, executor, item, kwargs)))
+            while len(pending) >= max_in_flight:
+                for res in await _next_done(pending, ordered):
+                    yield res
+        while pending:
+            for res in await _next_done(pending, ordered):
+                yield res
+    finally:
+        # the consumer stopped early
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,94 @@
+"""Read traces straight out of zip and tar(.gz, .bz2, .xz) archives.
+
+Members are read into memory one at a time and parsed from there
+(see Trace.read), so nothing is extracted to disk and a season's
+archive of any size is read in constant disk space and bounded
+memory:
+
+    from imlresi.archive import read_archive
+
+    for res in read_archive('season-2023.zip', '*.rgp', workers=8):
+        if res.error:
+            print(res.filename, res.error)
+
+The format of each member is identified from its contents, as for
+files. Results are named <archive>/<member>, e.g.
+'season-2023.zip/site1/1.rgp'.
+"""
+
+from fnmatch import fnmatch
+import os
+import tarfile
+import zipfile
+
+from .batch import _read_all
+
+
+def _skip(name):
+    # directories' and macOS resource fork entries
+    base = os.path.basename(name)
+    return not base or base.startswith('._') or name.startswith('__MACOSX/')
+
+
+def is_zip(archive):
+    """Whether archive (a filename or binary file object) is a zip
+    file rather than a tar file."""
+    if hasattr(archive, 'read') and not (hasattr(archive, 'seekable') and archive.seekable()):
+        # a zip can't be read without seeking to its end
+        return False
+    return zipfile.is_zipfile(archive)
+
+
+def members(archive, pattern='*'):
+    """Yield (name, bytes) for the files in a zip or tar archive (a
+    filename or binary file object) whose basename matches pattern.
+
+    Tar archives, compressed or not, are read as a stream, so can come
+    from a pipe or an upload.
+    """
+    if is_zip(archive):
+        with zipfile.ZipFile(archive) as zf:
+            for info in zf.infolist():
+                if info.is_dir() or _skip(info.filename) or not fnmatch(os.path.basename(info.filename), pattern):
+                    continue
+                yield info.filename, zf.read(info)
+        return
+
+    if hasattr(archive, 'read'):
+        tf = tarfile.open(fileobj=archive, mode='r|*')
+    else:
+        tf = tarfile.open(archive, mode='r|*')
+    with tf:
+        for info in tf:
+            if not info.isfile() or _skip(info.name) or not fnmatch(os.path.basename(info.name), pattern):
+                continue
+            f = tf.extractfile(info)
+            yield info.name, f.read()
+
+
+def read_archive(archive, pattern='*', workers=None, executor='process', ordered=True,
+                 stats=None, **kwargs):
+    """Read the traces in a zip or tar archive, yielding a
+    batch.ReadResult per member whose basename matches pattern.
+
+    workers, executor, ordered and stats are as for
+    batch.read_many(): members are parsed in parallel, with no more
+    than a few per worker read into memory at a time. Other keyword
+    arguments are passed to Trace.read(). A cache has to be keyed by
+    content (TraceCache(content_hash=True)), as members have no file
+    to stat.
+    """
+    cache = kwargs.get('cache')
+    if cache is not None and not cache.content_hash:
+        raise ValueError('archive members can only be cached with content_hash=True')
+    if hasattr(archive, 'read'):
+        prefix = getattr(archive, 'name', None)
+        if not isinstance(prefix, str):
+            prefix = '<archive>'
+    else:
+        prefix = archive
+    items = (
+        ('%s/%s' % (prefix, name), dict(kwargs, data=data))
+        for name, data in members(archive, pattern)
+    )
+    yield from _read_all(items, workers, executor, ordered, stats, 'read_archive')
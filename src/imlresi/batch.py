@@ -0,0 +1,165 @@
+"""Read many traces at once.
+
+Parsing is fanned out over a process (or thread) pool. A file that
+fails to read does not abort the batch; it comes back as a ReadResult
+with the error filled in and no trace.
+
+    from imlresi.batch import read_dir, ReadStats
+
+    stats = ReadStats()
+    for res in read_dir('field-data', '*.rgp', recursive=True, stats=stats):
+        if res.error:
+            print(res.filename, res.error)
+    print(stats)
+"""
+
+from collections import deque, namedtuple
+from glob import iglob
+import os
+import time
+
+from .trace import Trace
+
+
+# hash is Trace.hash(), if asked for (see read_one)
+ReadResult = namedtuple('ReadResult', ['filename', 'trace', 'error', 'hash'])
+ReadResult.__new__.__defaults__ = (None,)
+
+
+class ReadStats():
+    """Running totals for a read_many() batch."""
+
+    def __init__(self):
+        self.files = 0
+        self.failures = 0
+        self.t0 = None
+        self.elapsed = 0.
+
+    def start(self):
+        self.t0 = time.perf_counter()
+
+    def update(self, res):
+        self.files += 1
+        if res.error is not None:
+            self.failures += 1
+        self.elapsed = time.perf_counter() - self.t0
+
+    @property
+    def files_per_sec(self):
+        if not self.elapsed:
+            return 0.
+        return self.files/self.elapsed
+
+    def __str__(self):
+        return '%i files (%i failed) in %.2fs: %.1f files/s' % (
+            self.files, self.failures, self.elapsed, self.files_per_sec)
+
+
+def read_one(filename, hash=False, **kwargs):
+    """Read a single trace, returning a ReadResult rather than raising.
+
+    With hash=True the trace's hash() is computed too, so that it is
+    done in the worker when reading in parallel.
+    """
+    tr = Trace()
+    try:
+        tr.read(filename, **kwargs)
+        h = tr.hash() if hash else None
+    except Exception as err:
+        return ReadResult(filename, None, '%s: %s' % (type(err).__name__, err))
+    return ReadResult(filename, tr, None, h)
+
+
+def _read_one(args):
+    # top level so that it can be pickled for a process pool
+    filename, kwargs = args
+    return read_one(filename, **kwargs)
+
+
+def read_many(filenames, workers=None, executor='process', ordered=True,
+              stats=None, **kwargs):
+    """Read many traces in parallel, yielding a ReadResult per file.
+
+    workers is the pool size (default: number of CPUs); with workers=1
+    files are read in this process. executor is 'process' or
+    'thread'. If ordered is False results are yielded as they
+    complete rather than in input order. hash=True computes each
+    trace's hash() in the workers (see read_one). Any other keyword
+    arguments (e.g. header_only) are passed to Trace.read().
+
+    If stats (a ReadStats) is given it is updated as results are
+    yielded. A summary is logged when the batch is finished.
+    """
+    yield from _read_all(
+        ((fn, kwargs) for fn in filenames),
+        workers, executor, ordered, stats, 'read_many')
+
+
+def _read_all(items, workers, executor, ordered, stats, what, func=_read_one):
+    # read_many() for (filename, kwargs) items, or more generally
+    # func(item) -> ReadResult for any (picklable, top level) func
+    if stats is None:
+        stats = ReadStats()
+    if workers is None:
+        workers = os.cpu_count() or 1
+    stats.start()
+
+    def results():
+        if workers <= 1:
+            for item in items:
+                yield func(item)
+            return
+
+        # imported here as multiprocessing is slow to import and not
+        # needed for workers=1
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+        pool = {
+            'process': ProcessPoolExecutor,
+            'thread': ThreadPoolExecutor,
+        }[executor](max_workers=workers)
+
+        # keep a bounded number of files in flight so that huge batches
+        # don't queue every filename (and every result) up front
+        max_pending = 4*workers
+        with pool:
+            pending = deque()
+            for item in items:
+                pending.append(pool.submit(func, item))
+                while len(pending) >= max_pending:
+                    yield from _drain(pending, ordered)
+            while pending:
+                yield from _drain(pending, ordered)
+
+    for res in results():
+        stats.update(res)
+        yield res
+
+    import logging
+    logging.info('%s: %s' % (what, stats))
+
+
+def _drain(pending, ordered):
+    # wait for (at least) one of the pending futures and yield its result
+    if ordered:
+        yield pending.popleft().result()
+        return
+    from concurrent.futures import FIRST_COMPLETED, wait
+    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+    for fut in done:
+        pending.remove(fut)
+        yield fut.result()
+
+
+def read_dir(dirname, pattern='*', recursive=False, **kwargs):
+    """Read all traces in a directory matching a glob pattern.
+
+    With recursive=True subdirectories are searched too. Keyword
+    arguments are passed to read_many().
+    """
+    if recursive:
+        pattern = os.path.join('**', pattern)
+    filenames = (
+        fn for fn in sorted(iglob(os.path.join(dirname, pattern), recursive=recursive))
+        if os.path.isfile(fn)
+    )
+    return read_many(filenames, **kwargs)
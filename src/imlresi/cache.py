@@ -0,0 +1,129 @@
+"""An on-disk cache of parsed traces.
+
+    from imlresi.cache import TraceCache
+
+    cache = TraceCache('~/.cache/imlresi', max_bytes=2**30)
+    tr = Trace()
+    tr.read('trace.rgp', cache=cache)  # parsed and stored
+    tr.read('trace.rgp', cache=cache)  # loaded from the cache
+    print(cache.hits, cache.misses)
+
+Entries are keyed by path + size + mtime, or with content_hash=True
+by the md5 of the file contents (so renamed or copied files still
+hit). Each entry is one pickle holding header, settings, raw and the
+profiles as packed arrays of doubles. When the cache grows past
+max_bytes the least recently used entries are deleted.
+"""
+
+from array import array
+import hashlib
+import os
+import pickle
+
+
+# bump when the parse result of any reader changes, so stale entries
+# are never used
+CACHE_VERSION = 1
+
+
+class TraceCache():
+
+    def __init__(self, cachedir, max_bytes=2**30, content_hash=False):
+        self.cachedir = os.path.expanduser(cachedir)
+        self.max_bytes = max_bytes
+        self.content_hash = content_hash
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(self.cachedir, exist_ok=True)
+        self.nbytes = sum(size for _, _, size in self._entries())
+
+    def _entries(self):
+        for entry in os.scandir(self.cachedir):
+            if entry.name.endswith('.pkl'):
+                st = entry.stat()
+                yield entry.path, st.st_mtime, st.st_size
+
+    def _path(self, key):
+        return os.path.join(self.cachedir, key + '.pkl')
+
+    def key(self, fn, data=None, fmt=None):
+        """The cache key of trace file fn.
+
+        Returns (key, data). In content_hash mode the file is read (if
+        data, its bytes, isn't given already) and data is returned so
+        the caller doesn't need to read it again. fmt is the format
+        the file is read as, if not identified.
+        """
+        h = hashlib.md5(b'%i:' % CACHE_VERSION)
+        if fmt is not None:
+            # a different reader gives a different result
+            h.update(('fmt=%s:' % fmt).encode())
+        if self.content_hash:
+            if data is None:
+                with open(fn, 'rb') as f:
+                    data = f.read()
+            h.update(data)
+        else:
+            st = os.stat(fn)
+            h.update(('%s:%i:%i' % (os.path.abspath(fn), st.st_size, st.st_mtime_ns)).encode())
+        return h.hexdigest(), data
+
+    def get(self, key):
+        """The cached read result for key, or None."""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                res = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        # mark as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        res['drill'] = res['drill'].tolist()
+        if res['feed'] is not None:
+            res['feed'] = res['feed'].tolist()
+        return res
+
+    def put(self, key, res):
+        """Store a read result (as returned by the read_* functions)."""
+        res = dict(res)
+        res['drill'] = array('d', res['drill'])
+        if res['feed'] is not None:
+            res['feed'] = array('d', res['feed'])
+        path = self._path(key)
+        tmp = '%s.%i.tmp' % (path, os.getpid())
+        with open(tmp, 'wb') as f:
+            pickle.dump(res, f, protocol=pickle.HIGHEST_PROTOCOL)
+        try:
+            # an entry being overwritten is already counted
+            old = os.path.getsize(path)
+        except OSError:
+            old = 0
+        os.replace(tmp, path)
+        self.nbytes += os.path.getsize(path) - old
+        if self.nbytes > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until under max_bytes."""
+        entries = sorted(self._entries(), key=lambda e: e[1])
+        self.nbytes = sum(size for _, _, size in entries)
+        for path, _, size in entries:
+            if self.nbytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.nbytes -= size
+            self.evictions += 1
+
+    def clear(self):
+        for path, _, _ in list(self._entries()):
+            os.remove(path)
+        self.nbytes = 0
@@ -0,0 +1,136 @@
+"""Trace quality checks, evaluated for a whole collection at once.
+
+    from imlresi.checks import check
+
+    flags = check(tc)  # tc a TraceCollection (or a list of Traces)
+    bad = ~flags['ok']
+
+check() returns a flag table: a dict of per-trace boolean arrays, one
+per rule, plus 'ok' (no rule flagged). Each rule works on the
+collection's flat profile arrays, so there is no Python loop over
+samples or traces.
+
+Rules (and their parameters, see DEFAULT_RULES):
+
+- overload_drill/overload_feed: the profile sits at its peak for at
+  least min_samples samples, i.e. it looks clipped. The
+  max_*_amplitude settings just record the peaks (and are swapped
+  between the binary and json formats) so the observed peak is used,
+  unless an absolute level is given.
+- underload: the longest run of drill values below level is at least
+  min_mm long.
+- sample_count: the number of drill samples isn't samples_per_mm *
+  drill_depth (where both are known), or the feed (if any) isn't as
+  long as the drill.
+- abort: abortState (json/pdc only) is not one of ok. Which states are
+  benign is a guess; 3 is what complete test traces have.
+- trailing_bytes: read_bin(strict=False) found rubbish after the
+  samples (e.g. tests/data/6-131-nofeed-withtrailingrubbish.rgp).
+"""
+
+import numpy as np
+
+from .collection import TraceCollection
+
+
+DEFAULT_RULES = {
+    'overload_drill': {'min_samples': 5, 'level': None},
+    'overload_feed': {'min_samples': 5, 'level': None},
+    'underload': {'level': 0.5, 'min_mm': 10.},
+    'sample_count': {},
+    'abort': {'ok': (0, 3)},
+    'trailing_bytes': {},
+}
+
+
+def _overload(tc, channel, min_samples, level):
+    values = getattr(tc, channel)
+    idx = tc.trace_index(channel)
+    if level is None:
+        peak = tc.reduce(np.maximum, channel)
+        at_peak = values >= peak[idx]
+        # an all-zero profile is flat, not clipped
+        at_peak &= values > 0
+    else:
+        at_peak = values >= level
+    counts = np.bincount(idx[at_peak], minlength=len(tc))
+    return counts >= min_samples
+
+
+def longest_run(tc, mask, channel='drill'):
+    """The length of the longest run of True in mask (a boolean array
+    over the flat channel array) within each trace."""
+    offsets = getattr(tc, channel + '_offsets')
+    prev = np.empty_like(mask)
+    prev[1:] = mask[:-1]
+    prev[:1] = False
+    # runs never continue into the next trace
+    prev[offsets[:-1][offsets[:-1] < mask.size]] = False
+    starts = mask & ~prev
+    run_id = np.cumsum(starts) - 1
+    run_lengths = np.bincount(run_id[mask], minlength=int(starts.sum()))
+    run_trace = tc.trace_index(channel)[starts]
+    out = np.zeros(len(tc), dtype=np.int64)
+    np.maximum.at(out, run_trace, run_lengths)
+    return out
+
+
+def _underload(tc, level, min_mm):
+    spm = tc.column('samples_per_mm', float)
+    run = longest_run(tc, tc.drill < level)
+    return run >= min_mm*spm
+
+
+def _sample_count(tc):
+    npts = tc.column('samples_per_mm', float)*tc.column('drill_depth', float)
+    ndrill = tc.drill_lengths
+    nfeed = tc.feed_lengths
+    # an unknown expected count isn't flagged
+    return (np.isfinite(npts) & (ndrill != npts)) | ((nfeed != 0) & (nfeed != ndrill))
+
+
+def _abort(tc, ok):
+    if 'abortState' not in tc.settings:
+        return np.zeros(len(tc), dtype=bool)
+    return np.array([v is not None and v not in ok for v in tc.column('abortState')])
+
+
+def _trailing_bytes(tc):
+    if 'trailing_bytes' not in tc.settings:
+        return np.zeros(len(tc), dtype=bool)
+    return np.nan_to_num(tc.column('trailing_bytes', float)) > 0
+
+
+def check(traces, rules=None):
+    """Evaluate quality rules for every trace.
+
+    traces is a TraceCollection (or an iterable of Traces, which is
+    collected first). rules maps rule name to parameters (overriding
+    DEFAULT_RULES); only the rules given are evaluated. Returns a dict
+    of rule name (and 'ok') to a boolean array with one entry per
+    trace, True where the rule flagged the trace.
+    """
+    if not isinstance(traces, TraceCollection):
+        traces = TraceCollection.from_traces(traces)
+    if rules is None:
+        rules = DEFAULT_RULES
+
+    flags = {}
+    for name, params in rules.items():
+        if name not in DEFAULT_RULES:
+            raise ValueError('unknown rule %r' % name)
+        params = {**DEFAULT_RULES[name], **(params or {})}
+        if name == 'overload_drill':
+            flags[name] = _overload(traces, 'drill', **params)
+        elif name == 'overload_feed':
+            flags[name] = _overload(traces, 'feed', **params)
+        elif name == 'underload':
+            flags[name] = _underload(traces, **params)
+        elif name == 'sample_count':
+            flags[name] = _sample_count(traces)
+        elif name == 'abort':
+            flags[name] = _abort(traces, **params)
+        elif name == 'trailing_bytes':
+            flags[name] = _trailing_bytes(traces)
+    flags['ok'] = ~np.any([f for f in flags.values()], axis=0) if flags else np.ones(len(traces), dtype=bool)
+    return flags
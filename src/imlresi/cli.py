@@ -0,0 +1,264 @@
+"""The imlresi command.
+
+    imlresi convert -o out/ -f json -r -j 8 field-season/
+    imlresi index -o index.csv -r field-season/
+    imlresi check -r field-season/ '*.pdc'
+
+Inputs are files, directories (whose files matching --pattern are
+read, recursively with -r) or glob patterns. Progress goes to stderr
+and a summary (files, failures, files/s) is printed at the end. The
+exit status is 1 if any file failed to read, so cron can notice.
+
+convert -f json/rgp names each output after its input, relative to
+an input directory. An input whose output another input has already
+taken (e.g. a/x.rgp b/x.rgp) fails rather than overwriting it.
+"""
+
+import argparse
+import csv
+from glob import glob, has_magic
+import os
+import sys
+
+from .batch import ReadResult, ReadStats, _read_all, read_many, read_one
+
+
+FORMATS = ('json', 'rgp', 'jsonl', 'parquet', 'compact')
+
+
+def expand(inputs, pattern='*', recursive=False):
+    """Yield (filename, path relative to its input) for inputs."""
+    for inp in inputs:
+        if os.path.isdir(inp):
+            pat = os.path.join('**', pattern) if recursive else pattern
+            for fn in sorted(glob(os.path.join(inp, pat), recursive=recursive)):
+                if os.path.isfile(fn):
+                    yield fn, os.path.relpath(fn, inp)
+        elif has_magic(inp):
+            for fn in sorted(glob(inp, recursive=recursive)):
+                if os.path.isfile(fn):
+                    yield fn, os.path.basename(fn)
+        else:
+            yield inp, os.path.basename(inp)
+
+
+class Progress():
+    """Report progress on stderr every `every` files."""
+
+    def __init__(self, stats, total, every=100, quiet=False):
+        self.stats = stats
+        self.total = total
+        self.every = every
+        self.quiet = quiet
+
+    def update(self, res):
+        if res.error is not None:
+            print('%s: %s' % (res.filename, res.error), file=sys.stderr)
+        if self.quiet:
+            return
+        if self.stats.files % self.every == 0 or self.stats.files == self.total:
+            print('%i/%i files, %i failed, %.1f files/s' % (
+                self.stats.files, self.total, self.stats.failures, self.stats.files_per_sec),
+                file=sys.stderr)
+
+
+def _outputs(files, output, fmt):
+    # (filename, output file, the earlier filename with the same
+    # output file or None) for converting files to fmt files in output
+    seen = {}
+    for fn, relpath in files:
+        out = os.path.join(output, os.path.splitext(relpath)[0] + '.' + fmt)
+        yield fn, out, seen.get(out)
+        seen.setdefault(out, fn)
+
+
+def _results(args, convert=None, **kwargs):
+    # with convert (a format) each trace is converted and written to
+    # its own file in the workers, and the results have no trace
+    files = list(expand(args.inputs, args.pattern, args.recursive))
+    stats = args.stats = ReadStats()
+    progress = Progress(stats, len(files), args.progress_every, args.quiet)
+    if convert is None:
+        results = read_many([fn for fn, _ in files], workers=args.jobs, stats=stats, **kwargs)
+    else:
+        items = (
+            (fn, out, other, convert, kwargs)
+            for fn, out, other in _outputs(files, args.output, convert)
+        )
+        results = _read_all(items, args.jobs, 'process', True, stats, 'convert', _convert_one)
+    for res in results:
+        progress.update(res)
+        yield res
+
+
+def _traces(results):
+    for res in results:
+        if res.trace is not None:
+            yield res.trace
+
+
+def _failed(stats, filename, err):
+    # as a read error, but found after reading
+    stats.failures += 1
+    print('%s: %s: %s' % (filename, type(err).__name__, err), file=sys.stderr)
+
+
+def _converted(results, args, func):
+    # func(trace) for every trace read, skipping (and reporting) the
+    # ones it fails for
+    for res in results:
+        if res.trace is None:
+            continue
+        try:
+            yield func(res.trace)
+        except Exception as err:
+            _failed(args.stats, res.filename, err)
+
+
+def _convert_one(item):
+    # top level so that it can be pickled for a process pool
+    filename, output, other, fmt, kwargs = item
+    if other is not None:
+        # e.g. a/x.rgp and b/x.rgp given as files
+        return ReadResult(filename, None, 'ValueError: %s would overwrite the output of %s' % (output, other))
+    res = read_one(filename, **kwargs)
+    if res.error is not None:
+        return res
+    try:
+        # encoded in full first so that a trace that can't be leaves
+        # no (empty) file behind
+        if fmt == 'json':
+            b = res.trace.to_json().encode('utf-8')
+        else:
+            b = res.trace.to_rgp_bin()
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        with open(output, 'wb') as f:
+            f.write(b)
+    except Exception as err:
+        return ReadResult(filename, None, '%s: %s' % (type(err).__name__, err))
+    return ReadResult(filename, None, None)
+
+
+def convert(args):
+    os.makedirs(args.output, exist_ok=True)
+    strict = not args.lenient
+    if args.format in ('json', 'rgp'):
+        for _ in _results(args, args.format, strict=strict):
+            pass
+        return
+
+    results = _results(args, strict=strict)
+    if args.format == 'jsonl':
+        with open(os.path.join(args.output, 'traces.jsonl'), 'w') as f:
+            for s in _converted(results, args, lambda tr: tr.to_json()):
+                f.write(s)
+                f.write('\n')
+    elif args.format == 'parquet':
+        from .parquet import _row, _write_rows
+        _write_rows(
+            _converted(results, args, _row),
+            os.path.join(args.output, 'traces.parquet'),
+        )
+    elif args.format == 'compact':
+        from .compact import CompactTrace, save
+        save(
+            _converted(results, args, CompactTrace.from_trace),
+            os.path.join(args.output, 'traces.npz'),
+        )
+
+
+def index(args):
+    from .schema import HEADER_KEYS, SETTINGS_KEYS
+    out = open(args.output, 'w', newline='') if args.output else sys.stdout
+    try:
+        w = csv.writer(out)
+        w.writerow(('trace_filename', 'trace_format', 'error') + HEADER_KEYS + SETTINGS_KEYS)
+        for res in _results(args, header_only=True):
+            tr = res.trace
+            if tr is None:
+                w.writerow((res.filename, None, res.error))
+                continue
+            w.writerow(
+                (res.filename, tr.trace_format, None) +
+                tuple(tr.header.get(k) for k in HEADER_KEYS) +
+                tuple(tr.settings.get(k) for k in SETTINGS_KEYS)
+            )
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+def check(args):
+    from .checks import DEFAULT_RULES, check
+    from .collection import TraceCollection
+    rules = list(DEFAULT_RULES)
+    out = open(args.output, 'w', newline='') if args.output else sys.stdout
+    flagged = 0
+    try:
+        w = csv.writer(out)
+        w.writerow(['trace_filename', 'ok'] + rules)
+
+        def flush(batch):
+            tc = TraceCollection.from_traces(batch)
+            flags = check(tc)
+            for i, fn in enumerate(tc.trace_filename):
+                w.writerow([fn, int(flags['ok'][i])] + [int(flags[r][i]) for r in rules])
+            return len(tc) - int(flags['ok'].sum())
+
+        batch = []
+        # strict=False so that trailing rubbish is flagged rather than fatal
+        for tr in _traces(_results(args, strict=False)):
+            batch.append(tr)
+            if len(batch) >= args.batch_size:
+                flagged += flush(batch)
+                batch = []
+        if batch:
+            flagged += flush(batch)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print('%i flagged' % flagged, file=sys.stderr)
+
+
+def parser():
+    p = argparse.ArgumentParser(prog='imlresi', description='Tools for IML-Resi PowerDrill traces.')
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('inputs', nargs='+', help='files, directories or glob patterns')
+    common.add_argument('-r', '--recursive', action='store_true', help='descend into subdirectories')
+    common.add_argument('--pattern', default='*', help='files to read in input directories (default: %(default)s)')
+    common.add_argument('-j', '--jobs', type=int, default=None, help='parallel workers (default: number of CPUs)')
+    common.add_argument('-q', '--quiet', action='store_true', help='no progress reporting')
+    common.add_argument('--progress-every', type=int, default=100, metavar='N', help='report progress every N files')
+
+    sub = p.add_subparsers(dest='command', required=True)
+    c = sub.add_parser('convert', parents=[common], help='convert traces to json/parquet/compact binary')
+    c.add_argument('-o', '--output', required=True, help='output directory')
+    c.add_argument('-f', '--format', choices=FORMATS, default='json',
+                   help='one .json/.rgp (binary) per trace (mirroring input directories), or one traces.jsonl/.parquet/.npz')
+    c.add_argument('--lenient', action='store_true', help='ignore trailing rubbish in binary traces')
+    c.set_defaults(func=convert)
+
+    c = sub.add_parser('index', parents=[common], help='write a csv table of trace metadata')
+    c.add_argument('-o', '--output', help='csv file (default: stdout)')
+    c.set_defaults(func=index)
+
+    c = sub.add_parser('check', parents=[common], help='write a csv table of quality flags')
+    c.add_argument('-o', '--output', help='csv file (default: stdout)')
+    c.add_argument('--batch-size', type=int, default=1000, help='traces checked at a time')
+    c.set_defaults(func=check)
+    return p
+
+
+def main(argv=None):
+    args = parser().parse_args(argv)
+    args.stats = None
+    args.func(args)
+    if args.stats is not None:
+        print(args.stats, file=sys.stderr)
+        if args.stats.failures:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""A columnar store for many traces.
+
+All drill (and feed) profiles are concatenated into one contiguous
+numpy array with an offsets index, so trace i's drill profile is
+drill[drill_offsets[i]:drill_offsets[i+1]]. header and settings are
+kept as one list per key (a metadata table) rather than one dict per
+trace. Indexing a TraceCollection gives back a Trace whose drill and
+feed are views into the shared arrays.
+
+    from imlresi.batch import read_dir
+    from imlresi.collection import TraceCollection
+
+    tc = TraceCollection.from_traces(
+        r.trace for r in read_dir('field-data', '*.rgp') if r.trace
+    )
+    peak = tc.reduce(np.maximum)  # max drill value of every trace
+"""
+
+import numpy as np
+
+from .trace import Trace
+
+
+# marks a key that a trace's header/settings did not have
+_MISSING = object()
+
+
+def _offsets(lengths):
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
+
+class TraceCollection():
+    """Many traces stored column-wise.
+
+    dtype is the dtype the profiles are stored in. float32 halves the
+    memory of float64 but the values are then no longer exactly the
+    ones read from file (so Trace.hash() of a view will differ).
+
+    A feed of None is stored (and given back) as an empty profile.
+    """
+
+    def __init__(self, dtype=np.float32):
+        self.dtype = np.dtype(dtype)
+        self.drill = np.zeros(0, dtype=self.dtype)
+        self.drill_offsets = np.zeros(1, dtype=np.int64)
+        self.feed = np.zeros(0, dtype=self.dtype)
+        self.feed_offsets = np.zeros(1, dtype=np.int64)
+        self.header = {}
+        self.settings = {}
+        self.trace_filename = []
+        self.trace_format = []
+
+    @classmethod
+    def from_traces(cls, traces, dtype=np.float32):
+        tc = cls(dtype)
+        tc.extend(traces)
+        return tc
+
+    def extend(self, traces):
+        """Add traces (any iterable of Trace) to the collection."""
+        drills = [self.drill]
+        feeds = [self.feed]
+        n0 = len(self)
+        n = n0
+        for tr in traces:
+            drills.append(np.asarray(tr.drill, dtype=self.dtype))
+            feeds.append(np.asarray(tr.feed if tr.feed is not None else [], dtype=self.dtype))
+            for table, meta in ((self.header, tr.header), (self.settings, tr.settings)):
+                for k in meta:
+                    if k not in table:
+                        table[k] = [_MISSING]*n
+                for k, col in table.items():
+                    col.append(meta.get(k, _MISSING))
+            self.trace_filename.append(getattr(tr, 'trace_filename', None))
+            self.trace_format.append(getattr(tr, 'trace_format', None))
+            n += 1
+        if n == n0:
+            return
+
+        # concatenate once rather than per trace
+        self.drill_offsets = np.concatenate((
+            self.drill_offsets[:-1],
+            self.drill_offsets[-1] + _offsets([len(d) for d in drills[1:]]),
+        ))
+        self.feed_offsets = np.concatenate((
+            self.feed_offsets[:-1],
+            self.feed_offsets[-1] + _offsets([len(f) for f in feeds[1:]]),
+        ))
+        self.drill = np.concatenate(drills)
+        self.feed = np.concatenate(feeds)
+
+    def __len__(self):
+        return len(self.drill_offsets) - 1
+
+    def get_drill(self, i):
+        return self.drill[self.drill_offsets[i]:self.drill_offsets[i+1]]
+
+    def get_feed(self, i):
+        return self.feed[self.feed_offsets[i]:self.feed_offsets[i+1]]
+
+    def get_header(self, i):
+        return {k: col[i] for k, col in self.header.items() if col[i] is not _MISSING}
+
+    def get_settings(self, i):
+        return {k: col[i] for k, col in self.settings.items() if col[i] is not _MISSING}
+
+    def __getitem__(self, i):
+        """A Trace whose drill and feed are views into the collection."""
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('TraceCollection index out of range')
+        tr = Trace()
+        tr.header = self.get_header(i)
+        tr.settings = self.get_settings(i)
+        tr.drill = self.get_drill(i)
+        tr.feed = self.get_feed(i)
+        tr.trace_filename = self.trace_filename[i]
+        tr.trace_format = self.trace_format[i]
+        return tr
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def column(self, key, dtype=None):
+        """One header or settings field for every trace.
+
+        Missing values are None, or nan if a numeric dtype is given
+        (all of them, for a key no trace has).
+        """
+        if key in self.header:
+            col = [None if v is _MISSING else v for v in self.header[key]]
+        elif key in self.settings:
+            col = [None if v is _MISSING else v for v in self.settings[key]]
+        else:
+            col = [None]*len(self)
+        if dtype is None:
+            return col
+        if np.dtype(dtype).kind == 'f':
+            col = [np.nan if v is None else v for v in col]
+        return np.array(col, dtype=dtype)
+
+    @property
+    def drill_lengths(self):
+        return np.diff(self.drill_offsets)
+
+    @property
+    def feed_lengths(self):
+        return np.diff(self.feed_offsets)
+
+    def trace_index(self, channel='drill'):
+        """The index of the trace each sample in the flat array belongs to."""
+        offsets = getattr(self, channel + '_offsets')
+        return np.repeat(np.arange(len(self)), np.diff(offsets))
+
+    def reduce(self, ufunc, channel='drill'):
+        """Apply ufunc.reduce to every trace's profile in one go.
+
+        E.g. tc.reduce(np.add) gives the sum of each drill
+        profile. Traces with an empty profile give nan.
+        """
+        values = getattr(self, channel)
+        offsets = getattr(self, channel + '_offsets')
+        out = np.full(len(self), np.nan)
+        nonempty = offsets[1:] > offsets[:-1]
+        if nonempty.any():
+            # reduceat can't do empty segments, but skipping them leaves
+            # each remaining segment running up to the start of the next
+            out[nonempty] = ufunc.reduceat(values, offsets[:-1][nonempty])
+        return out
+
+    @property
+    def nbytes(self):
+        """Bytes used by the profile arrays and their offsets."""
+        return (
+            self.drill.nbytes + self.drill_offsets.nbytes +
+            self.feed.nbytes + self.feed_offsets.nbytes
+        )
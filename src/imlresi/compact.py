@@ -0,0 +1,207 @@
+"""A small-footprint trace for keeping very many traces in memory.
+
+CompactTrace has __slots__ instead of a __dict__, keeps drill and feed
+as uint16 arrays of hundredths (the way the binary .rgp format stores
+them, 2 bytes/sample) and header + settings in a fixed-field Meta
+namedtuple. raw is not kept unless asked for; otherwise it is re-read
+from trace_filename when needed.
+
+    from imlresi.compact import CompactTrace
+
+    traces = [CompactTrace.read(fn) for fn in filenames]
+    traces[0].get_resiId(), traces[0].drill[:10]
+
+save() and load() store many traces in one numpy .npz file in the
+same form (the profiles as concatenated uint16 arrays, the Meta
+fields as JSON).
+"""
+
+from array import array
+from collections import namedtuple
+import sys
+
+import ujson as json
+
+from .readers import get_reader
+from .schema import EXTRA_SETTINGS_KEYS, HEADER_KEYS, SETTINGS_KEYS
+from .trace import Trace, identify_format, quantise
+
+
+# the values are stored in hundredths
+SCALE = 100
+
+Meta = namedtuple(
+    'Meta',
+    HEADER_KEYS + SETTINGS_KEYS + EXTRA_SETTINGS_KEYS,
+    defaults=(None,)*(len(HEADER_KEYS) + len(SETTINGS_KEYS) + len(EXTRA_SETTINGS_KEYS)),
+)
+
+
+def _intern(v):
+    # serials, versions, dates etc. repeat across many traces
+    return sys.intern(v) if isinstance(v, str) else v
+
+
+class CompactTrace():
+
+    __slots__ = ('meta', 'drill_counts', 'feed_counts', 'trace_filename', 'trace_format', '_raw')
+
+    def __init__(self, meta=None, drill_counts=None, feed_counts=None,
+                 trace_filename=None, trace_format=None, raw=None):
+        self.meta = meta if meta is not None else Meta()
+        self.drill_counts = drill_counts if drill_counts is not None else array('H')
+        # None if the trace had no feed at all (as opposed to an empty one)
+        self.feed_counts = feed_counts
+        self.trace_filename = trace_filename
+        self.trace_format = trace_format
+        self._raw = raw
+
+    @classmethod
+    def from_trace(cls, tr, keep_raw=False):
+        meta = Meta(**{
+            k: _intern(v)
+            for k, v in {**tr.header, **tr.settings}.items()
+            if k in Meta._fields
+        })
+        return cls(
+            meta,
+            quantise(tr.drill),
+            quantise(tr.feed) if tr.feed is not None else None,
+            getattr(tr, 'trace_filename', None),
+            getattr(tr, 'trace_format', None),
+            tr.raw if keep_raw else None,
+        )
+
+    @classmethod
+    def read(cls, trace_filename, keep_raw=False, **kwargs):
+        """Read a trace file (see Trace.read) into a CompactTrace."""
+        tr = Trace()
+        tr.read(trace_filename, **kwargs)
+        return cls.from_trace(tr, keep_raw)
+
+    @property
+    def drill(self):
+        return [c/SCALE for c in self.drill_counts]
+
+    @property
+    def feed(self):
+        if self.feed_counts is None:
+            return None
+        return [c/SCALE for c in self.feed_counts]
+
+    @property
+    def header(self):
+        return {k: getattr(self.meta, k) for k in HEADER_KEYS}
+
+    @property
+    def settings(self):
+        settings = {k: getattr(self.meta, k) for k in SETTINGS_KEYS}
+        for k in EXTRA_SETTINGS_KEYS:
+            v = getattr(self.meta, k)
+            if v is not None:
+                settings[k] = v
+        return settings
+
+    @property
+    def raw(self):
+        """The raw trace, re-read from trace_filename unless kept."""
+        if self._raw is None and self.trace_filename is not None:
+            fmt = self.trace_format or identify_format(self.trace_filename)
+            return get_reader(fmt)(self.trace_filename)['raw']
+        return self._raw
+
+    def to_trace(self):
+        """A full (dict and list based) Trace."""
+        tr = Trace()
+        tr.header = self.header
+        tr.settings = self.settings
+        tr.drill = self.drill
+        tr.feed = self.feed
+        tr.raw = self.raw
+        tr.trace_filename = self.trace_filename
+        tr.trace_format = self.trace_format
+        return tr
+
+    def __repr__(self):
+        return '%s(%r, %i drill, %s feed)' % (
+            self.__class__.__name__, self.trace_filename, len(self.drill_counts),
+            len(self.feed_counts) if self.feed_counts is not None else None)
+
+    # the accessors only need header/settings/drill/feed
+    get_resiId = Trace.get_resiId
+    get_location = Trace.get_location
+    get_latlon = Trace.get_latlon
+    get_drilltime = Trace.get_drilltime
+    get_tilt = Trace.get_tilt
+    get_comment = Trace.get_comment
+    get_remark = Trace.get_remark
+    get_instrument = Trace.get_instrument
+    get_feedspeed = Trace.get_feedspeed
+    get_rpm = Trace.get_rpm
+    get_measnumber = Trace.get_measnumber
+    fingerprint = Trace.fingerprint
+
+
+def save(traces, fn):
+    """Save traces (Traces or CompactTraces) to a .npz file."""
+    import numpy as np
+    drill = array('H')
+    feed = array('H')
+    drill_counts = []
+    feed_counts = []
+    meta = []
+    filenames = []
+    formats = []
+    for tr in traces:
+        if not isinstance(tr, CompactTrace):
+            tr = CompactTrace.from_trace(tr)
+        drill.extend(tr.drill_counts)
+        drill_counts.append(len(tr.drill_counts))
+        if tr.feed_counts is None:
+            feed_counts.append(-1)
+        else:
+            feed.extend(tr.feed_counts)
+            feed_counts.append(len(tr.feed_counts))
+        meta.append(tr.meta)
+        filenames.append(tr.trace_filename)
+        formats.append(tr.trace_format)
+    np.savez(
+        fn,
+        drill=np.frombuffer(drill, dtype=np.uint16),
+        feed=np.frombuffer(feed, dtype=np.uint16),
+        drill_counts=np.array(drill_counts, dtype=np.int64),
+        # -1 for no feed at all
+        feed_counts=np.array(feed_counts, dtype=np.int64),
+        meta=np.array(json.dumps({
+            'fields': Meta._fields,
+            'meta': meta,
+            'trace_filename': filenames,
+            'trace_format': formats,
+        })),
+    )
+
+
+def load(fn):
+    """Load the list of CompactTraces saved in a .npz file."""
+    import numpy as np
+    with np.load(fn) as npz:
+        drill = npz['drill'].tobytes()
+        feed = npz['feed'].tobytes()
+        drill_counts = npz['drill_counts'].tolist()
+        feed_counts = npz['feed_counts'].tolist()
+        info = json.loads(str(npz['meta']))
+    traces = []
+    i = j = 0
+    for n, (nd, nf) in enumerate(zip(drill_counts, feed_counts)):
+        d = array('H', drill[2*i:2*(i + nd)])
+        i += nd
+        f = None
+        if nf >= 0:
+            f = array('H', feed[2*j:2*(j + nf)])
+            j += nf
+        meta = Meta(**{
+            k: _intern(v) for k, v in zip(info['fields'], info['meta'][n])
+            if k in Meta._fields
+        })
+        traces.append(CompactTrace(meta, d, f, info['trace_filename'][n], info['trace_format'][n]))
+    return traces
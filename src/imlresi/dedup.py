@@ -0,0 +1,76 @@
+"""Find traces that have been seen before, whatever format they came in.
+
+A FingerprintIndex is a persistent set of Trace.fingerprint()
+digests. It is held in memory as a set, so each lookup is O(1), and
+backed by an append-only file of 16-byte records:
+
+    from imlresi.dedup import FingerprintIndex
+
+    with FingerprintIndex('fingerprints.bin') as index:
+        for tr in index.filter_new(traces):
+            store(tr)
+"""
+
+import os
+
+
+RECORD_SIZE = 16  # an md5 digest
+
+
+class FingerprintIndex():
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.fingerprints = set()
+        if os.path.exists(filename):
+            with open(filename, 'rb') as f:
+                data = f.read()
+            # a partially written last record (from an interrupted
+            # append) is ignored and overwritten
+            n = len(data)//RECORD_SIZE
+            self.fingerprints.update(
+                data[i:i+RECORD_SIZE] for i in range(0, n*RECORD_SIZE, RECORD_SIZE)
+            )
+            if len(data) != n*RECORD_SIZE:
+                with open(filename, 'r+b') as f:
+                    f.truncate(n*RECORD_SIZE)
+        self._f = open(filename, 'ab')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._f.close()
+
+    def flush(self):
+        self._f.flush()
+
+    def __len__(self):
+        return len(self.fingerprints)
+
+    def __contains__(self, fingerprint):
+        return bytes.fromhex(fingerprint) in self.fingerprints
+
+    def add(self, fingerprint):
+        """Add a fingerprint (hex digest). Returns True if it is new."""
+        digest = bytes.fromhex(fingerprint)
+        if digest in self.fingerprints:
+            return False
+        self.fingerprints.add(digest)
+        self._f.write(digest)
+        return True
+
+    def check(self, fingerprints):
+        """Which of fingerprints are already known, as a list of bools."""
+        return [bytes.fromhex(fp) in self.fingerprints for fp in fingerprints]
+
+    def filter_new(self, traces):
+        """Yield the traces whose fingerprint is not yet known, adding
+        them as they go (so duplicates within traces are dropped too)."""
+        for tr in traces:
+            if self.add(tr.fingerprint()):
+                yield tr
+        self.flush()
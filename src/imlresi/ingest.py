@@ -0,0 +1,149 @@
+"""Incremental ingestion of a growing directory of traces.
+
+A manifest (a JSON file) records path, size, mtime, Trace.hash() and
+format of every file already ingested. Each run only parses files
+that are new or whose size/mtime changed, and reports files that have
+disappeared:
+
+    from imlresi.ingest import ingest, IngestReport
+
+    report = IngestReport()
+    for res in ingest('field-data', 'field-data.manifest.json', report=report):
+        if res.trace is not None:
+            store(res.trace)
+    print(report)
+
+The manifest is checkpointed every checkpoint_every files, so an
+interrupted run resumes where it stopped: files already recorded are
+unchanged as far as the next run is concerned.
+"""
+
+from glob import iglob
+import os
+
+import ujson as json
+
+from .batch import read_many
+
+
+class IngestReport():
+    """What an ingest() run found."""
+
+    def __init__(self):
+        self.new = []
+        self.modified = []
+        self.deleted = []
+        self.unchanged = 0
+        self.failed = []
+
+    def __str__(self):
+        return '%i new, %i modified, %i deleted, %i unchanged, %i failed' % (
+            len(self.new), len(self.modified), len(self.deleted),
+            self.unchanged, len(self.failed))
+
+
+class Manifest():
+    """path -> {'size', 'mtime_ns', 'hash', 'format', 'error'}"""
+
+    def __init__(self, filename):
+        self.filename = filename
+        try:
+            with open(filename, 'r') as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            self.entries = {}
+
+    def save(self):
+        # write-then-rename so an interruption never leaves a truncated
+        # manifest behind
+        tmp = self.filename + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp, self.filename)
+
+    def is_current(self, path, st):
+        entry = self.entries.get(path)
+        return (
+            entry is not None and
+            entry['size'] == st.st_size and
+            entry['mtime_ns'] == st.st_mtime_ns
+        )
+
+
+def scan(dirname, manifest, pattern='*', recursive=True, report=None):
+    """Compare a directory with a manifest.
+
+    Returns the files needing to be (re)read, as a dict of path to
+    os.stat() result. If report (an IngestReport) is given new,
+    modified, deleted and unchanged are filled in.
+    """
+    if report is None:
+        report = IngestReport()
+    if recursive:
+        pattern = os.path.join('**', pattern)
+    seen = set()
+    todo = {}
+    for path in sorted(iglob(os.path.join(dirname, pattern), recursive=recursive)):
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        if not os.path.isfile(path):
+            continue
+        seen.add(path)
+        if manifest.is_current(path, st):
+            report.unchanged += 1
+            continue
+        if path in manifest.entries:
+            report.modified.append(path)
+        else:
+            report.new.append(path)
+        todo[path] = st
+    report.deleted.extend(sorted(p for p in manifest.entries if p not in seen))
+    return todo
+
+
+def ingest(dirname, manifest_filename, pattern='*', recursive=True,
+           checkpoint_every=1000, report=None, **kwargs):
+    """Read the new and modified traces in dirname, yielding a
+    batch.ReadResult for each.
+
+    A file is added to the manifest once the caller asks for the next
+    result (the manifest is saved every checkpoint_every files); deleted files are dropped from it once
+    the run completes. Files that fail to read are recorded with their
+    error and not retried until they change. Other keyword arguments
+    are passed to batch.read_many().
+    """
+    if report is None:
+        report = IngestReport()
+    manifest = Manifest(manifest_filename)
+    todo = scan(dirname, manifest, pattern, recursive, report)
+
+    n = 0
+    # hashed in the workers rather than here
+    for res in read_many(list(todo), hash=True, **kwargs):
+        # size/mtime as of the scan; if the file changed since, the
+        # next run picks it up again
+        st = todo[res.filename]
+        entry = {
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'hash': None,
+            'format': None,
+            'error': res.error,
+        }
+        if res.trace is not None:
+            entry['hash'] = res.hash
+            entry['format'] = res.trace.trace_format
+        else:
+            report.failed.append(res.filename)
+        yield res
+        # only recorded once the caller has dealt with it
+        manifest.entries[res.filename] = entry
+        n += 1
+        if n % checkpoint_every == 0:
+            manifest.save()
+
+    for path in report.deleted:
+        manifest.entries.pop(path, None)
+    manifest.save()
@@ -0,0 +1,202 @@
+"""Per-stage timing and counters for reading traces.
+
+Recording is off by default, and then costs one global lookup and
+None check per stage. Switch it on around a run:
+
+    from imlresi import metrics
+
+    with metrics.recording() as m:
+        for res in read_many(filenames, workers=1):
+            ...
+    print(m.to_json())        # or m.to_prometheus()
+
+Recorded (labelled by format where there is one):
+
+- counters: files, bytes (read or passed in as data) and samples
+  (drill + feed) per format.
+- histograms of wall time per stage: read_file, identify_format,
+  parse, and within parsing json_escape (load_iml_json's tab
+  escaping), json_loads and decode_samples; to_json and hash.
+
+Callbacks (see Metrics.add_callback) are called with a dict per
+file read: filename, format, bytes, samples and the stage times.
+
+The recorder is per process: with read_many(executor='process')
+stages run in the worker processes are not seen. Use workers=1 or
+executor='thread' when measuring.
+"""
+
+import time
+
+
+# upper bounds (s) of the histogram buckets
+BUCKETS = (1e-5, 3e-5, 1e-4, 3e-4, 1e-3, 3e-3, 1e-2, 3e-2, 0.1, 0.3, 1., 3., 10.)
+
+# the active Metrics, or None
+recorder = None
+
+
+class Histogram():
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0]*(len(buckets) + 1)  # the last one is +Inf
+        self.count = 0
+        self.sum = 0.
+
+    def observe(self, value):
+        for i, le in enumerate(self.buckets):
+            if value <= le:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'buckets': dict(zip([str(le) for le in self.buckets] + ['+Inf'], self.counts)),
+        }
+
+
+class Metrics():
+    """Counters and stage time histograms, keyed by (name, format)."""
+
+    def __init__(self, buckets=BUCKETS):
+        import threading
+        self.buckets = buckets
+        self.counters = {}
+        self.histograms = {}
+        self.callbacks = []
+        self._lock = threading.Lock()
+        # stage times of the file being read, per thread
+        self._local = threading.local()
+
+    clock = staticmethod(time.perf_counter)
+
+    def add_callback(self, callback):
+        """Call callback(record) for every file read."""
+        self.callbacks.append(callback)
+
+    def observe(self, stage, seconds, fmt=None):
+        with self._lock:
+            h = self.histograms.get((stage, fmt))
+            if h is None:
+                h = self.histograms[(stage, fmt)] = Histogram(self.buckets)
+            h.observe(seconds)
+        stages = getattr(self._local, 'stages', None)
+        if stages is not None:
+            stages[stage] = stages.get(stage, 0.) + seconds
+
+    def lap(self, stage, t0, fmt=None):
+        """Record the time since t0 (from clock()) against stage and
+        return the current time, for timing the next stage."""
+        t = self.clock()
+        self.observe(stage, t - t0, fmt)
+        return t
+
+    def count(self, name, value=1, fmt=None):
+        with self._lock:
+            self.counters[(name, fmt)] = self.counters.get((name, fmt), 0) + value
+
+    def start_file(self):
+        self._local.stages = {}
+
+    def end_file(self, filename, fmt, nbytes, nsamples):
+        stages = getattr(self._local, 'stages', None) or {}
+        self._local.stages = None
+        self.count('files', 1, fmt)
+        self.count('bytes', nbytes, fmt)
+        self.count('samples', nsamples, fmt)
+        if self.callbacks:
+            record = {
+                'filename': filename,
+                'format': fmt,
+                'bytes': nbytes,
+                'samples': nsamples,
+                'stages': stages,
+            }
+            for callback in self.callbacks:
+                callback(record)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'counters': [
+                    {'name': name, 'format': fmt, 'value': value}
+                    for (name, fmt), value in sorted(self.counters.items(), key=_sort_key)
+                ],
+                'stages': [
+                    dict(stage=stage, format=fmt, **h.to_dict())
+                    for (stage, fmt), h in sorted(self.histograms.items(), key=_sort_key)
+                ],
+            }
+
+    def to_json(self):
+        import ujson as json
+        return json.dumps(self.to_dict())
+
+    def to_prometheus(self, prefix='imlresi'):
+        """The metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            counters = sorted(self.counters.items(), key=_sort_key)
+            histograms = sorted(self.histograms.items(), key=_sort_key)
+            for name in sorted({name for (name, _), _ in counters}):
+                metric = '%s_%s_total' % (prefix, name)
+                lines.append('# TYPE %s counter' % metric)
+                for (n, fmt), value in counters:
+                    if n == name:
+                        lines.append('%s%s %s' % (metric, _labels(format=fmt), value))
+            if histograms:
+                metric = '%s_stage_seconds' % prefix
+                lines.append('# HELP %s Wall time per stage of reading a trace.' % metric)
+                lines.append('# TYPE %s histogram' % metric)
+                for (stage, fmt), h in histograms:
+                    cumulative = 0
+                    for le, n in zip([repr(le) for le in h.buckets] + ['+Inf'], h.counts):
+                        cumulative += n
+                        lines.append('%s_bucket%s %i' % (metric, _labels(stage=stage, format=fmt, le=le), cumulative))
+                    lines.append('%s_sum%s %r' % (metric, _labels(stage=stage, format=fmt), h.sum))
+                    lines.append('%s_count%s %i' % (metric, _labels(stage=stage, format=fmt), h.count))
+        return '\n'.join(lines) + '\n'
+
+
+def _sort_key(item):
+    (name, fmt), _ = item
+    return name, fmt or ''
+
+
+def _labels(**labels):
+    s = ','.join('%s="%s"' % (k, v) for k, v in labels.items() if v is not None)
+    return '{%s}' % s if s else ''
+
+
+def enable(m=None):
+    """Start recording into m (a new Metrics if None). Returns it."""
+    global recorder
+    recorder = m if m is not None else Metrics()
+    return recorder
+
+
+def disable():
+    global recorder
+    recorder = None
+
+
+class recording():
+    """Context manager recording into a Metrics for its duration."""
+
+    def __init__(self, m=None):
+        self.m = m
+
+    def __enter__(self):
+        self.previous = recorder
+        return enable(self.m)
+
+    def __exit__(self, *exc):
+        global recorder
+        recorder = self.previous
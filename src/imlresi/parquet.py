@@ -0,0 +1,116 @@
+"""Write traces to (and read them back from) Apache Parquet.
+
+Each trace is one row: typed columns for the normalised header and
+settings keys, the drill time as a timestamp, latitude/longitude from
+Trace.get_latlon(), and list<double> columns for drill and feed.
+
+Rows are written in row groups as they arrive, so arbitrarily large
+batches can be streamed with bounded memory:
+
+    from imlresi.batch import read_dir
+    from imlresi.parquet import write_parquet, read_parquet
+
+    write_parquet((r.trace for r in read_dir('field-data') if r.trace), 'traces.parquet')
+    tc = read_parquet('traces.parquet')  # a TraceCollection
+
+Requires pyarrow.
+"""
+
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .collection import TraceCollection
+from .schema import EXTRA_SETTINGS_KEYS, HEADER_KEYS, ROW_FIELDS, SETTINGS_KEYS, row_values
+from .trace import Trace
+
+
+# python type of a schema.ROW_FIELDS column -> arrow type
+ARROW_TYPES = {
+    str: pa.string(),
+    int: pa.int64(),
+    float: pa.float64(),
+    datetime: pa.timestamp('s'),
+}
+
+SCHEMA = pa.schema(
+    [(k, ARROW_TYPES[t]) for k, t in ROW_FIELDS]
+    + [
+        ('drill', pa.list_(pa.float64())),
+        ('feed', pa.list_(pa.float64())),
+    ]
+)
+
+
+def _row(tr):
+    values = row_values(tr)
+    values['drill'] = list(map(float, tr.drill))
+    values['feed'] = list(map(float, tr.feed)) if tr.feed is not None else None
+    return values
+
+
+def to_arrow(traces):
+    """Convert traces to a pyarrow Table."""
+    return pa.Table.from_pylist([_row(tr) for tr in traces], schema=SCHEMA)
+
+
+def write_parquet(traces, where, row_group_size=1000, **kwargs):
+    """Write traces to a Parquet file, row_group_size traces at a time.
+
+    traces can be any iterable (e.g. a generator over
+    batch.read_many() results); only one row group is held in memory
+    at once. Other keyword arguments are passed to
+    pyarrow.parquet.ParquetWriter (e.g. compression).
+    """
+    _write_rows(map(_row, traces), where, row_group_size, **kwargs)
+
+
+def _write_rows(rows, where, row_group_size=1000, **kwargs):
+    # write_parquet() for _row() dicts
+    with pq.ParquetWriter(where, SCHEMA, **kwargs) as writer:
+        group = []
+        for row in rows:
+            group.append(row)
+            if len(group) == row_group_size:
+                writer.write_table(pa.Table.from_pylist(group, schema=SCHEMA))
+                group = []
+        if group:
+            writer.write_table(pa.Table.from_pylist(group, schema=SCHEMA))
+
+
+def iter_parquet(where):
+    """Yield Traces from a Parquet file written by write_parquet(),
+    reading one row group (row_group_size traces when written) at a
+    time, so that memory is bounded by the writer's row group size.
+
+    Values come back as the column types (e.g. bin drill_depth 0 as
+    0.0). Trace.raw is None.
+    """
+    pf = pq.ParquetFile(where)
+    for i in range(pf.num_row_groups):
+        for row in pf.read_row_group(i).to_pylist():
+            tr = Trace()
+            tr.trace_filename = row['trace_filename']
+            tr.trace_format = row['trace_format']
+            drilltime = row['drilltime']
+            if drilltime is not None:
+                tr.header['date'] = drilltime.strftime('%d.%m.%Y')
+                tr.header['time'] = drilltime.strftime('%H:%M:%S')
+            for k in HEADER_KEYS:
+                if k in row:
+                    tr.header[k] = row[k]
+            for k in SETTINGS_KEYS:
+                tr.settings[k] = row[k]
+            for k in EXTRA_SETTINGS_KEYS:
+                if row[k] is not None:
+                    tr.settings[k] = row[k]
+            tr.drill = row['drill']
+            tr.feed = row['feed']
+            yield tr
+
+
+def read_parquet(where, dtype='float32'):
+    """Read a Parquet file written by write_parquet() into a
+    TraceCollection."""
+    return TraceCollection.from_traces(iter_parquet(where), dtype=dtype)
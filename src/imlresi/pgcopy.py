@@ -0,0 +1,183 @@
+"""Load traces into PostgreSQL with one COPY.
+
+Each trace is one row of COPY text format: the hash() and
+fingerprint() as uuids, the normalised header and settings keys, the
+drill time and location, and the profiles either as the to_json()
+document (a jsonb column) or as drill and feed float8[] columns.
+Rows are generated as the traces arrive, so any number of traces can
+be streamed in bounded memory:
+
+    from imlresi.batch import read_dir
+    from imlresi import pgcopy
+
+    traces = (r.trace for r in read_dir('field-data') if r.trace)
+    cur.execute(pgcopy.create_table_sql('traces'))
+    cur.copy_expert(pgcopy.copy_sql('traces'), pgcopy.CopyStream(traces))  # psycopg2
+
+or with psycopg 3:
+
+    with cur.copy(pgcopy.copy_sql('traces')) as copy:
+        for line in pgcopy.copy_rows(traces):
+            copy.write(line)
+
+Postgres rejects NUL in text and \\u0000 in jsonb, so both are
+dropped; backslash, tab, newline and carriage return are escaped.
+"""
+
+from datetime import datetime
+import hashlib
+import re
+
+from .schema import ROW_FIELDS, row_values
+
+
+# python type of a schema.ROW_FIELDS column -> postgres type
+PG_TYPES = {
+    str: 'text',
+    int: 'bigint',
+    float: 'double precision',
+    datetime: 'timestamp',
+}
+
+COLUMNS = (
+    [
+        ('hash', 'uuid'),
+        ('fingerprint', 'uuid'),
+    ]
+    + [(k, PG_TYPES[t]) for k, t in ROW_FIELDS]
+)
+
+PROFILE_COLUMNS = {
+    'jsonb': [('trace', 'jsonb')],
+    'arrays': [('drill', 'float8[]'), ('feed', 'float8[]')],
+}
+
+_ESCAPES = str.maketrans({
+    '\\': '\\\\',
+    '\t': '\\t',
+    '\n': '\\n',
+    '\r': '\\r',
+    '\x00': None,
+})
+
+# a \u0000 escape in JSON text, but not an escaped backslash followed
+# by "u0000"
+_JSON_NUL = re.compile(r'(?<!\\)((?:\\\\)*)\\u0000')
+
+
+def columns(profile='jsonb'):
+    """The (name, postgres type) of every column, for profile 'jsonb'
+    or 'arrays'."""
+    return COLUMNS + PROFILE_COLUMNS[profile]
+
+
+def _quote(name):
+    return '"%s"' % name
+
+
+def create_table_sql(table, profile='jsonb'):
+    return 'CREATE TABLE IF NOT EXISTS %s (\n%s\n)' % (table, ',\n'.join(
+        '    %s %s' % (_quote(name), t) for name, t in columns(profile)))
+
+
+def copy_sql(table, profile='jsonb'):
+    return 'COPY %s (%s) FROM STDIN' % (table, ', '.join(_quote(name) for name, _ in columns(profile)))
+
+
+def escape(s):
+    """s as a COPY text field."""
+    return s.translate(_ESCAPES)
+
+
+def _field(v, t):
+    if v is None:
+        return '\\N'
+    if t == 'bigint':
+        return '%i' % v
+    if t == 'double precision':
+        return _float(v)
+    if t == 'timestamp':
+        return v.isoformat(' ')
+    return escape(str(v))
+
+
+def _float(v):
+    v = float(v)
+    if v != v:
+        return 'NaN'
+    if v in (float('inf'), float('-inf')):
+        return 'Infinity' if v > 0 else '-Infinity'
+    return repr(v)
+
+
+def _array(values):
+    if values is None:
+        return '\\N'
+    return '{%s}' % ','.join(map(_float, values))
+
+
+def _fingerprint(tr):
+    # needs a drill time and measurement number
+    try:
+        return tr.fingerprint()
+    except (KeyError, ValueError, TypeError):
+        return None
+
+
+def row(tr, profile='jsonb'):
+    """One trace as a line of COPY text (ending in a newline)."""
+    values = row_values(tr)
+    # to_json() once for both the hash (as Trace.hash()) and the jsonb
+    s = tr.to_json()
+    fields = [
+        # md5 hex digests, which postgres takes as uuids as they are
+        _field(hashlib.md5(s.encode('utf-8')).hexdigest(), 'uuid'),
+        _field(_fingerprint(tr), 'uuid'),
+    ]
+    for k, t in ROW_FIELDS:
+        fields.append(_field(values[k], PG_TYPES[t]))
+    if profile == 'jsonb':
+        fields.append(escape(_JSON_NUL.sub(r'\1', s)))
+    elif profile == 'arrays':
+        fields.append(_array(tr.drill))
+        fields.append(_array(tr.feed))
+    else:
+        raise ValueError('profile must be one of %s' % ', '.join(PROFILE_COLUMNS))
+    return '\t'.join(fields) + '\n'
+
+
+def copy_rows(traces, profile='jsonb'):
+    """Yield a line of COPY text per trace."""
+    for tr in traces:
+        yield row(tr, profile)
+
+
+def write_copy(traces, fp, profile='jsonb'):
+    """Write the COPY text for traces to the text file object fp.
+    Returns the number of rows."""
+    n = 0
+    for line in copy_rows(traces, profile):
+        fp.write(line)
+        n += 1
+    return n
+
+
+class CopyStream():
+    """A binary file-like object reading the COPY text for traces, as
+    e.g. psycopg2's copy_expert() wants. Rows are generated as they are
+    read."""
+
+    def __init__(self, traces, profile='jsonb'):
+        self._rows = copy_rows(traces, profile)
+        self._buf = b''
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buf) < size:
+            line = next(self._rows, None)
+            if line is None:
+                break
+            self._buf += line.encode('utf-8')
+        if size < 0:
+            size = len(self._buf)
+        b, self._buf = self._buf[:size], self._buf[size:]
+        return b
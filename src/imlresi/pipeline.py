@@ -0,0 +1,194 @@
+"""Composable processing of drill/feed profiles.
+
+The steps work on a 1-D profile or a 2-D batch of profiles (one per
+row, shorter ones padded with nan at the end, see stack()) and
+operate along the last axis with numpy kernels, so a whole batch is
+processed without a Python loop over samples or traces:
+
+    from functools import partial
+    from imlresi.batch import read_dir
+    from imlresi.pipeline import Pipeline, smooth, detrend, rolling_percentile
+
+    pipe = Pipeline([
+        partial(smooth, window=11),
+        detrend,
+        partial(rolling_percentile, window=51, q=90),
+    ])
+    for res, profile in pipe.stream(read_dir('field-data', '*.rgp')):
+        ...
+
+stream() holds at most batch_size traces at a time, so memory stays
+bounded however many traces go through it. run() applies the
+pipeline to a list of traces at once and returns the 2-D result.
+"""
+
+import warnings
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def stack(profiles, dtype=float):
+    """Stack profiles of different lengths into a 2-D array, padding
+    with nan. Returns (array, lengths)."""
+    profiles = [np.asarray(p if p is not None else [], dtype=dtype) for p in profiles]
+    lengths = np.array([len(p) for p in profiles], dtype=np.int64)
+    out = np.full((len(profiles), lengths.max(initial=0)), np.nan, dtype=dtype)
+    if profiles:
+        out[np.arange(out.shape[1]) < lengths[:, None]] = np.concatenate(profiles)
+    return out, lengths
+
+
+# elements in the sliding windows rolling_percentile() sorts at once
+_WINDOW_ELEMENTS = 1 << 22
+
+
+def _pad(x, window, fill=np.nan):
+    # centre a window of this width on each sample; fill None repeats
+    # the end samples
+    left = (window - 1)//2
+    width = [(0, 0)]*(x.ndim - 1) + [(left, window - 1 - left)]
+    if fill is None:
+        return np.pad(x, width, mode='edge')
+    return np.pad(x, width, constant_values=fill)
+
+
+def smooth(x, window=5):
+    """Centred moving average over window samples. Near the ends (and
+    next to nan padding) only the samples available are averaged."""
+    x = np.asarray(x, dtype=float)
+    valid = ~np.isnan(x)
+    width = [(0, 0)]*(x.ndim - 1) + [(1, 0)]
+    sums = np.pad(np.cumsum(_pad(np.where(valid, x, 0.), window, 0.), axis=-1), width)
+    counts = np.pad(np.cumsum(_pad(valid, window, False), axis=-1), width)
+    with np.errstate(invalid='ignore'):
+        out = (sums[..., window:] - sums[..., :-window])/(counts[..., window:] - counts[..., :-window])
+    out[~valid] = np.nan
+    return out
+
+
+def detrend(x):
+    """Subtract the least-squares straight line (e.g. feed force
+    drifting with depth) from each profile."""
+    x = np.asarray(x, dtype=float)
+    valid = ~np.isnan(x)
+    i = np.where(valid, np.arange(x.shape[-1], dtype=float), np.nan)
+    with warnings.catch_warnings():
+        # all-nan (empty) profiles
+        warnings.simplefilter('ignore', RuntimeWarning)
+        mi = np.nanmean(i, axis=-1, keepdims=True)
+        mx = np.nanmean(x, axis=-1, keepdims=True)
+    di = i - mi
+    ss = np.nansum(di*di, axis=-1, keepdims=True)
+    slope = np.divide(np.nansum(di*(x - mx), axis=-1, keepdims=True), ss,
+                      out=np.zeros_like(ss), where=ss > 0)
+    return x - mx - slope*di
+
+
+def derivative(x, spacing=1.):
+    """First derivative along each profile: central differences inside,
+    one-sided at the ends. spacing is the distance between samples
+    (e.g. 1/samples_per_mm for a derivative per mm); for a 2-D batch
+    it can also be one value per row."""
+    x = np.asarray(x, dtype=float)
+    out = np.full_like(x, np.nan)
+    n = x.shape[-1]
+    if n < 2:
+        return out
+    out[..., 1:-1] = (x[..., 2:] - x[..., :-2])/2
+    out[..., 0] = x[..., 1] - x[..., 0]
+    # the last sample of each profile, which is not the last column if
+    # the profile is nan padded
+    last = np.sum(~np.isnan(x), axis=-1) - 1
+    ok = last >= 1
+    if x.ndim == 1:
+        if ok:
+            out[last] = x[last] - x[last - 1]
+    else:
+        rows = np.nonzero(ok)[0]
+        out[rows, last[ok]] = x[rows, last[ok]] - x[rows, last[ok] - 1]
+    out[np.isnan(x)] = np.nan
+    spacing = np.asarray(spacing, dtype=float)
+    if spacing.ndim == 1:
+        spacing = spacing[:, None]
+    return out/spacing
+
+
+def _rolling_percentile(x, window, q):
+    # x 2-D with no nan, a few rows at a time to bound the memory
+    # np.percentile() takes for its partitioned copy of the windows
+    out = np.empty_like(x)
+    rows = max(1, _WINDOW_ELEMENTS//(x.shape[-1]*window))
+    for i in range(0, len(x), rows):
+        windows = sliding_window_view(_pad(x[i:i + rows], window, None), window, axis=-1)
+        out[i:i + rows] = np.percentile(windows, q, axis=-1)
+    return out
+
+
+def rolling_percentile(x, window=51, q=50.):
+    """The q-th percentile of a centred window of window samples (e.g.
+    a moving-window density estimate that ignores short spikes). The
+    end samples are repeated to fill the windows at the ends, and nan
+    samples (e.g. stack() padding) are left out."""
+    x = np.asarray(x, dtype=float)
+    if x.shape[-1] == 0:
+        return x.copy()
+    rows = x.reshape(-1, x.shape[-1])
+    valid = ~np.isnan(rows)
+    full = valid.all(axis=-1)
+    out = np.full_like(rows, np.nan)
+    out[full] = _rolling_percentile(rows[full], window, q)
+    for i in np.nonzero(~full & valid.any(axis=-1))[0]:
+        out[i, valid[i]] = _rolling_percentile(rows[i, valid[i]][None], window, q)[0]
+    return out.reshape(x.shape)
+
+
+class Pipeline():
+    """A sequence of steps, each a function of a 1-D or 2-D array
+    returning an array of the same shape (see smooth(), detrend(),
+    derivative() and rolling_percentile(); use functools.partial to
+    set their parameters)."""
+
+    def __init__(self, steps=()):
+        self.steps = list(steps)
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, self.steps)
+
+    def apply(self, x):
+        """Apply the steps to a profile or a 2-D batch of profiles."""
+        for step in self.steps:
+            x = step(x)
+        return x
+
+    def run(self, traces, channel='drill'):
+        """Apply the pipeline to one channel of many traces at once.
+        Returns (2-D array, lengths), see stack()."""
+        x, lengths = stack([getattr(tr, channel) for tr in traces])
+        return self.apply(x), lengths
+
+    def stream(self, items, channel='drill', batch_size=256):
+        """Apply the pipeline to an iterable of Traces or
+        batch.ReadResults (e.g. from read_many()), batch_size at a time.
+
+        Yields (item, profile) in input order, profile being a 1-D
+        array; it is None for ReadResults that failed to read.
+        """
+        batch = []
+
+        def flush():
+            traces = [getattr(item, 'trace', item) for item in batch]
+            ok = [i for i, tr in enumerate(traces) if tr is not None]
+            out, lengths = self.run([traces[i] for i in ok], channel)
+            profiles = [None]*len(batch)
+            for row, i in enumerate(ok):
+                profiles[i] = out[row, :lengths[row]]
+            return zip(batch, profiles)
+
+        for item in items:
+            batch.append(item)
+            if len(batch) >= batch_size:
+                yield from flush()
+                batch = []
+        if batch:
+            yield from flush()
@@ -0,0 +1,83 @@
+"""The registry of trace readers, one per file format.
+
+A reader is a function (filename, header_only=False, data=None) that
+returns a dict with 'header', 'settings', 'drill', 'feed' and 'raw'
+(see trace.read_bin etc). Readers are looked up by format name and
+only imported the first time that format is read.
+
+The built-in formats (bin, json, pdc, txt1, txt2) are in
+trace.py. Other packages can add formats through the
+"imlresi.readers" entry point group, e.g. in their setup.py:
+
+    entry_points={
+        'imlresi.readers': [
+            'csv = mypackage.resi:read_csv',
+        ],
+    }
+
+and read them with Trace.read(filename, fmt='csv') (identify_format
+only knows the built-in formats). register() adds or replaces a
+reader at run time.
+"""
+
+from importlib import import_module
+
+
+ENTRY_POINT_GROUP = 'imlresi.readers'
+
+# also declared as entry points in setup.py, but resolved without
+# scanning the installed packages' metadata, which is slow
+BUILTIN = {
+    'bin': 'imlresi.trace:read_bin',
+    'json': 'imlresi.trace:read_json',
+    'pdc': 'imlresi.trace:read_pdc',
+    'txt1': 'imlresi.trace:read_txt1',
+    'txt2': 'imlresi.trace:read_txt2',
+}
+
+_readers = {}
+
+
+def _load(spec):
+    module, _, attr = spec.partition(':')
+    return getattr(import_module(module), attr)
+
+
+def _entry_points():
+    from importlib.metadata import entry_points
+    eps = entry_points()
+    if hasattr(eps, 'select'):
+        return eps.select(group=ENTRY_POINT_GROUP)
+    # python < 3.10
+    return eps.get(ENTRY_POINT_GROUP, [])
+
+
+def register(fmt, reader):
+    """Use reader (a function, or a "module:function" string) for fmt."""
+    _readers[fmt] = _load(reader) if isinstance(reader, str) else reader
+
+
+def get_reader(fmt):
+    """The reader for fmt. Raises ValueError for an unknown format."""
+    try:
+        return _readers[fmt]
+    except KeyError:
+        pass
+    if fmt in BUILTIN:
+        reader = _load(BUILTIN[fmt])
+    else:
+        for ep in _entry_points():
+            if ep.name == fmt:
+                reader = ep.load()
+                break
+        else:
+            raise ValueError('no reader for format %r' % fmt)
+    _readers[fmt] = reader
+    return reader
+
+
+def formats():
+    """The names of all the formats there are readers for."""
+    names = set(BUILTIN) | set(_readers)
+    names.update(ep.name for ep in _entry_points())
+    return sorted(names)
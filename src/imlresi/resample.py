@@ -0,0 +1,95 @@
+"""Resample many traces onto a common depth grid.
+
+Traces differ in samples_per_mm and drill_depth, so comparing or
+stacking them needs them on a shared depth axis first:
+
+    from imlresi.resample import depth_grid, resample
+
+    grid = depth_grid(tc, step=0.5)  # mm
+    X = resample(tc, grid)           # shape (len(tc), len(grid))
+
+The whole collection is resampled in one vectorised operation. Grid
+points beyond a trace's depth are nan.
+"""
+
+import numpy as np
+
+from .collection import TraceCollection
+
+
+def _collect(traces):
+    if isinstance(traces, TraceCollection):
+        return traces
+    return TraceCollection.from_traces(traces)
+
+
+def samples_per_mm(tc):
+    """samples_per_mm of every trace in a collection (see
+    Trace.get_samples_per_mm)."""
+    spm = tc.column('samples_per_mm', float)
+    missing = ~(spm > 0)
+    if missing.any():
+        spm[missing] = tc.drill_lengths[missing]/tc.column('drill_depth', float)[missing]
+    return spm
+
+
+def flat_depth(tc, channel='drill'):
+    """The depth (mm) of every sample in the flat channel array."""
+    offsets = getattr(tc, channel + '_offsets')
+    idx = tc.trace_index(channel)
+    return (np.arange(offsets[-1]) - offsets[idx])/samples_per_mm(tc)[idx]
+
+
+def depth_grid(traces, step=1.):
+    """A grid from 0 to the deepest trace's last sample, step mm apart."""
+    tc = _collect(traces)
+    max_depth = np.nanmax((tc.drill_lengths - 1)/samples_per_mm(tc), initial=0.)
+    return np.arange(0., max_depth + step/2, step)
+
+
+def resample(traces, grid, channel='drill', method='linear'):
+    """Resample one channel of many traces onto grid (mm, ascending).
+
+    method is 'linear' (interpolate between the two nearest samples)
+    or 'mean' (average the samples falling in [grid[j], grid[j+1]);
+    the last bin is as wide as the one before it). Returns a 2-D array
+    with a row per trace; grid points outside a trace are nan.
+    """
+    tc = _collect(traces)
+    grid = np.asarray(grid, dtype=float)
+    values = getattr(tc, channel).astype(float)
+    offsets = getattr(tc, channel + '_offsets')
+    lengths = np.diff(offsets)
+    spm = samples_per_mm(tc)
+
+    if method == 'linear':
+        # fractional sample index of every grid point in every trace
+        pos = grid[None, :]*spm[:, None]
+        valid = (pos >= 0) & (pos <= (lengths - 1)[:, None])
+        i0 = np.clip(np.floor(pos), 0, np.maximum(lengths - 2, 0)[:, None]).astype(np.int64)
+        frac = pos - i0
+        # (clipped so empty traces at the end still index something)
+        i0 = np.minimum(i0 + offsets[:-1, None], max(values.size - 1, 0))
+        i1 = np.minimum(i0 + 1, max(values.size - 1, 0))
+        out = np.full(pos.shape, np.nan)
+        if values.size:
+            out[valid] = (values[i0]*(1 - frac) + values[i1]*frac)[valid]
+        return out
+
+    if method == 'mean':
+        nbins = len(grid)
+        if not nbins:
+            return np.empty((len(tc), 0))
+        width = grid[-1] - grid[-2] if nbins > 1 else 1.
+        edges = np.append(grid, grid[-1] + width)
+        idx = tc.trace_index(channel)
+        b = np.searchsorted(edges, flat_depth(tc, channel), side='right') - 1
+        valid = (b >= 0) & (b < nbins)
+        key = idx[valid]*nbins + b[valid]
+        sums = np.bincount(key, weights=values[valid], minlength=len(tc)*nbins)
+        counts = np.bincount(key, minlength=len(tc)*nbins)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out = sums/counts
+        return out.reshape(len(tc), nbins)
+
+    raise ValueError('unknown method %r' % method)
@@ -0,0 +1,129 @@
+"""The header and settings keys every trace is normalised to.
+
+HEADER_KEYS, SETTINGS_KEYS and EXTRA_SETTINGS_KEYS are the fields of
+compact.Meta and the columns of cli index. ROW_FIELDS and row_values()
+are the flat, typed row the table writers (parquet, pgcopy) have for
+each trace; they map the python types to their own column types.
+"""
+
+from datetime import datetime
+
+
+HEADER_KEYS = (
+    'toolserial',
+    'firmware_version',
+    'SNRelectronic',
+    'hardwareVersion',
+    'date',
+    'time',
+    'measurement_number',
+    'description',
+    'direction',
+    'species',
+    'location',
+    'name',
+    'comment',
+)
+
+# settings every reader produces
+SETTINGS_KEYS = (
+    'max_drill_depth',
+    'depth_mode',
+    'preselected_depth',
+    'drill_depth',
+    'feed_speed',
+    'drill_resolution',
+    'feed_resolution',
+    'samples_per_mm',
+    'drill_motor_offset',
+    'feed_motor_offset',
+    'needle_speed',
+    'max_drill_amplitude',
+    'max_feed_amplitude',
+)
+
+# settings only the json/pdc readers produce; None means absent
+EXTRA_SETTINGS_KEYS = (
+    'deviceLength',
+    'depthMode',
+    'abortState',
+    'feedOn',
+    'ncOn',
+    'ncState',
+    'tiltOn',
+    'tiltRelOn',
+    'tiltRelAngle',
+    'tiltAngle',
+    'diameter',
+)
+
+# keys that aren't str; .pdc has true/false where .rgp json has 1/0, so
+# int ones are converted
+KEY_TYPES = {
+    'measurement_number': int,
+    'max_drill_depth': float,
+    'depth_mode': int,
+    'preselected_depth': float,
+    'drill_depth': float,
+    'feed_speed': float,
+    'drill_resolution': int,
+    'feed_resolution': float,
+    'samples_per_mm': float,
+    'drill_motor_offset': int,
+    'feed_motor_offset': int,
+    'needle_speed': int,
+    'max_drill_amplitude': float,
+    'max_feed_amplitude': float,
+    'deviceLength': float,
+    'depthMode': int,
+    'abortState': int,
+    'feedOn': int,
+    'ncOn': int,
+    'ncState': int,
+    'tiltOn': int,
+    'tiltRelOn': int,
+    'tiltRelAngle': float,
+    'tiltAngle': float,
+    'diameter': float,
+}
+
+# (name, type) of the columns the table writers (parquet, pgcopy) have
+# for every trace; date and time are combined into drilltime
+ROW_FIELDS = (
+    [
+        ('trace_filename', str),
+        ('trace_format', str),
+        ('drilltime', datetime),
+        ('latitude', float),
+        ('longitude', float),
+        ('location_accuracy', float),
+    ]
+    + [(k, KEY_TYPES.get(k, str)) for k in HEADER_KEYS if k not in ('date', 'time')]
+    + [(k, KEY_TYPES.get(k, str)) for k in SETTINGS_KEYS + EXTRA_SETTINGS_KEYS]
+)
+
+
+def row_values(tr):
+    """The ROW_FIELDS values of the Trace tr, as a dict. Missing
+    values are None."""
+    try:
+        drilltime = tr.get_drilltime()
+    except (KeyError, ValueError):
+        drilltime = None
+    lat, lon, dx = tr.get_latlon() if tr.header.get('location') else (None, None, None)
+    values = {
+        'trace_filename': getattr(tr, 'trace_filename', None),
+        'trace_format': getattr(tr, 'trace_format', None),
+        'drilltime': drilltime,
+        'latitude': lat,
+        'longitude': lon,
+        'location_accuracy': dx,
+    }
+    for k in HEADER_KEYS:
+        values[k] = tr.header.get(k)
+    for k in SETTINGS_KEYS + EXTRA_SETTINGS_KEYS:
+        values[k] = tr.settings.get(k)
+    for k, t in KEY_TYPES.items():
+        if t is int and values[k] is not None:
+            values[k] = int(values[k])
+    return {k: values[k] for k, _ in ROW_FIELDS}
@@ -0,0 +1,150 @@
+"""Flag likely bark, decay and cavities in many drill profiles at once.
+
+Works on profiles resampled to a common depth grid (see
+resample.py), one row per trace, and returns the flagged depth
+intervals as columns of arrays:
+
+    from imlresi.resample import depth_grid, resample
+    from imlresi.segments import LABELS, find_segments
+
+    grid = depth_grid(tc, step=0.5)
+    segs = find_segments(resample(tc, grid), grid)
+    for i, start, end, label in zip(*segs):
+        print(tc.trace_filename[i], start, end, LABELS[label])
+
+Levels are relative to each trace's median drill value (its "sound
+wood" level), so traces from differently set up tools can be
+processed together. Each label is found by thresholding with
+hysteresis: a region starts where the profile drops below enter and
+ends where it rises above exit again, so noise around a single
+threshold doesn't split it up. Regions shorter than min_mm are
+dropped. Cavities are (nearly) zero resistance, so a cavity is
+usually inside a decay region.
+
+The bark is the region from where the needle first meets resistance
+(above air) to where the profile first reaches bark; decay and
+cavities aren't looked for before the end of the bark.
+
+These are heuristics to point arborists at the traces worth looking
+at, not a diagnosis.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+
+DEFAULT_PARAMS = {
+    'bark': {'air': 0.05, 'bark': 0.8},
+    'decay': {'enter': 0.5, 'exit': 0.7, 'min_mm': 5.},
+    'cavity': {'enter': 0.1, 'exit': 0.2, 'min_mm': 2.},
+}
+
+LABELS = tuple(DEFAULT_PARAMS)
+
+Segments = namedtuple('Segments', ['trace', 'start', 'end', 'label'])
+Segments.__doc__ = """Flagged depth intervals [start, end) in mm, one
+entry per interval. trace is the row (trace) index, label an index
+into LABELS."""
+
+
+def hysteresis(X, enter, exit):
+    """Boolean array, True from where X drops below enter until it
+    rises above exit (along the last axis). nan ends a region."""
+    X = np.asarray(X, dtype=float)
+    n = X.shape[-1]
+    events = np.where(X < enter, 1, np.where((X > exit) | np.isnan(X), 0, -1))
+    # index of the most recent event at each sample, carried forward
+    last = np.where(events >= 0, np.arange(n), -1)
+    np.maximum.accumulate(last, axis=-1, out=last)
+    state = np.take_along_axis(events, np.maximum(last, 0), axis=-1) == 1
+    return state & (last >= 0)
+
+
+def intervals(mask, edges):
+    """The runs of True in each row of a 2-D mask, as (row, start,
+    end) arrays of column edges (edges has one more entry than mask
+    has columns)."""
+    mask = np.asarray(mask, dtype=np.int8)
+    padded = np.zeros((mask.shape[0], mask.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    d = np.diff(padded, axis=1)
+    # row-major order, so starts and ends pair up within each row
+    rows, starts = np.nonzero(d == 1)
+    _, ends = np.nonzero(d == -1)
+    return rows, edges[starts], edges[ends]
+
+
+def _edges(grid):
+    grid = np.asarray(grid, dtype=float)
+    step = grid[-1] - grid[-2] if len(grid) > 1 else 1.
+    return np.append(grid, grid[-1] + step)
+
+
+def _empty():
+    return Segments(np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(0), np.zeros(0, dtype=np.int8))
+
+
+def find_segments(X, grid, params=None):
+    """Find bark, decay and cavity intervals in profiles X (2-D, one
+    row per trace, on depth grid mm; nan beyond a trace's end).
+
+    params maps label to parameters (overriding DEFAULT_PARAMS); only
+    the labels given are looked for. Returns a Segments of arrays
+    sorted by trace then start.
+    """
+    X = np.atleast_2d(np.asarray(X, dtype=float))
+    if params is None:
+        params = DEFAULT_PARAMS
+    for name in params:
+        if name not in DEFAULT_PARAMS:
+            raise ValueError('unknown segment label %r' % name)
+    if len(grid) == 0:
+        # e.g. resample() of traces with no samples
+        return _empty()
+    edges = _edges(grid)
+    wanted = set(params)
+    params = {k: {**DEFAULT_PARAMS[k], **(params.get(k) or {})} for k in DEFAULT_PARAMS}
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # all-nan rows (empty traces) give nan and so flag nothing
+        level = np.nanmedian(np.where(np.isnan(X).all(axis=1, keepdims=True), 0, X), axis=1, keepdims=True)
+        R = X/level
+
+    cols = np.arange(X.shape[1])
+    p = params['bark']
+    found_wood = R >= p['bark']
+    has_wood = found_wood.any(axis=1)
+    bark_end = np.where(has_wood, found_wood.argmax(axis=1), 0)
+    bark_start = np.where((R > p['air']).any(axis=1), (R > p['air']).argmax(axis=1), 0)
+    after_bark = cols >= bark_end[:, None]
+
+    found = []
+    for label, name in enumerate(LABELS):
+        if name not in wanted:
+            continue
+        p = params[name]
+        if name == 'bark':
+            mask = (cols >= bark_start[:, None]) & ~after_bark & has_wood[:, None]
+            rows, start, end = intervals(mask, edges)
+        else:
+            mask = hysteresis(R, p['enter'], p['exit']) & after_bark
+            rows, start, end = intervals(mask, edges)
+            keep = end - start >= p['min_mm']
+            rows, start, end = rows[keep], start[keep], end[keep]
+        found.append((rows, start, end, np.full(len(rows), label, dtype=np.int8)))
+
+    if not found:
+        return _empty()
+    rows, start, end, label = (np.concatenate(c) for c in zip(*found))
+    order = np.lexsort((label, start, rows))
+    return Segments(rows[order], start[order], end[order], label[order])
+
+
+def per_trace(segs, ntraces):
+    """Segments as a list (one per trace) of (start, end, label name)
+    lists."""
+    out = [[] for _ in range(ntraces)]
+    for i, start, end, label in zip(*segs):
+        out[i].append((float(start), float(end), LABELS[label]))
+    return out
@@ -17,10 +17,6 @@ Todo:
 - merge 'header' and 'settings' (as 'meta'?)
 - used imutable namedtuple instead dicts as the class base data stores
 - accessors?
-- trace checks:
-  - underload
-  - overload
-  - etc
 - move to using pyproject.toml instead of setup.py
 - fix trace stability and tox test
 
@@ -41,40 +37,158 @@ jh, June 2016
 
 """
 
-from struct import unpack
-import logging
-import ujson as json  # faster; minifies by default
+from array import array
+from io import BytesIO, TextIOWrapper
+from itertools import islice
+from struct import error as StructError, pack, pack_into, unpack
+import sys
 
+# absolute, so that this file still runs as a script
+from imlresi import metrics
 
-def load_iml_json(fn):
+# logging, re, ujson (and numpy, matplotlib, ...) are imported where
+# they're needed, so that importing this module is cheap
+
+
+# how much of a file identify_format() looks at
+SNIFF_BYTES = 65536
+
+
+def is_data(source):
+    """Whether source is a trace in memory (bytes, bytearray,
+    memoryview or a binary file object) rather than a filename."""
+    return isinstance(source, (bytes, bytearray, memoryview)) or hasattr(source, 'read')
+
+
+def as_bytes(source):
+    """The bytes of a trace in memory (see is_data).
+
+    bytes, and memoryviews of the whole of a bytes object, are
+    returned as they are, without copying. Other buffers are copied
+    once: readers keep the bytes as raw, which mustn't change if the
+    caller reuses the buffer. File objects are read to the end.
+    """
+    if hasattr(source, 'read'):
+        source = source.read()
+    if isinstance(source, bytes):
+        return source
+    if isinstance(source, memoryview) and isinstance(source.obj, bytes) \
+            and source.c_contiguous and source.nbytes == len(source.obj):
+        return source.obj
+    return bytes(source)
+
+
+def _source(fn, data):
+    # a reader's (fn, data) with data as bytes; fn may itself be the
+    # data, in which case the name is None
+    if data is None and is_data(fn):
+        fn, data = None, fn
+    if data is not None:
+        data = as_bytes(data)
+    return fn, data
+
+
+def open_text(fn, data=None):
+    """Open a trace file for reading as text.
+
+    If data (the bytes of fn) is given it is wrapped instead, decoded
+    exactly as open(fn, 'r') would.
+    """
+    if data is None:
+        return open(fn, 'r')
+    return TextIOWrapper(BytesIO(as_bytes(data)))
+
+
+def load_iml_json(fn, header_only=False, data=None):
     """The json-like format IML uses sometimes isn't exactly JSON.
 
     E.g.: when PD-Tools translates an rgp file with multi line comment
     from binary to json formats it embeds TAB (\x09) characters in
     the "remark field. This breaks JSON parsers.
+
+    If header_only is True the contents of "profile" are cut out
+    before parsing (so the returned string is not the file contents).
     """
-    s = open(fn, 'r').read()
+    import ujson as json  # faster; minifies by default
+    fn, data = _source(fn, data)
+    rec = metrics.recorder
+    with open_text(fn, data) as f:
+        s = f.read()
+    if header_only:
+        s = strip_profile(s)
+    if rec is not None:
+        t = rec.clock()
     s = s.replace("\t", "\\t")
-    return json.loads(s), s
+    if rec is not None:
+        t = rec.lap('json_escape', t)
+    J = json.loads(s)
+    if rec is not None:
+        rec.lap('json_loads', t)
+    return J, s
 
 
-def identify_format(fn):
+def strip_profile(s):
+    """Replace the "profile" object of a json trace with an empty one.
+
+    "profile" only ever holds numeric arrays and a checksum, so the
+    first closing brace after the key closes it.
+    """
+    import re
+    # the key, not e.g. a name that happens to be "profile"
+    m = re.search(r'"profile"\s*:', s)
+    if m is None:
+        return s
+    i0 = m.start()
+    i1 = s.find('}', i0)
+    if i1 < 0:
+        return s
+    return s[:i0] + '"profile":{}' + s[i1+1:]
+
+
+def identify_format(fn, data=None):
     """
     Identify the trace file format
+
+    Only the first SNIFF_BYTES of the file are looked at. If data (the
+    bytes of fn) is given the file is not opened. fn can also be the
+    data itself (see is_data).
     """
-    with open(fn, 'rb') as f:
-        byte1 = bytes(f.read(1))
+    fn, data = _source(fn, data)
+    if data is None:
+        with open(fn, 'rb') as f:
+            prefix = f.read(SNIFF_BYTES)
+    else:
+        prefix = data[:SNIFF_BYTES]
+    byte1 = bytes(prefix[:1])
     if byte1 == b'\x12':
         fmt = 'bin'
     elif byte1 == b'\x7b':  # '{'=='\x7b'
-        data, _ = load_iml_json(fn)
-        if "dateTime" in data['header']:
+        # .pdc has "dateTime" in "header", which always comes before
+        # "profile". only if the prefix is inconclusive is the whole
+        # file parsed
+        import re
+        keys = {}
+        datetimes = []
+        for m in re.finditer(rb'"(header|dateTime|profile)"\s*:', prefix):
+            keys.setdefault(m.group(1), m.start())
+            if m.group(1) == b'dateTime':
+                datetimes.append(m.start())
+        # only a "dateTime" inside "header" counts (a json .rgp can
+        # have one in "app")
+        i0 = keys.get(b'header', SNIFF_BYTES)
+        i1 = keys.get(b'profile', SNIFF_BYTES)
+        if any(i0 < i < i1 for i in datetimes):
             fmt = 'pdc'
-        else:
+        elif (len(prefix) < SNIFF_BYTES and not datetimes) or keys.get(b'profile', -1) > keys.get(b'header', SNIFF_BYTES):
             fmt = 'json'
+        else:
+            J, _ = load_iml_json(fn, data=data)
+            if "dateTime" in J['header']:
+                fmt = 'pdc'
+            else:
+                fmt = 'json'
     else:
-        with open(fn, 'rb') as f:
-            line1 = f.readline().strip()
+        line1 = bytes(prefix).split(b'\n', 1)[0].strip()
         if line1 == b'0F02':
             fmt = 'txt2'
         else:
@@ -83,10 +197,40 @@ def identify_format(fn):
     return fmt
 
 
-def read_bin(fn):
+def decode_samples(buf, as_array=False):
+    """Decode a block of little-endian 2-byte unsigned ints (as stored in
+    the binary format) and scale them by 1/100.
+
+    The block is interpreted in one go rather than sample by
+    sample. If as_array is True a numpy float array is returned,
+    otherwise a list of floats.
+    """
+    if as_array:
+        import numpy as np
+        return np.frombuffer(buf, dtype='<u2') / 100.
+
+    counts = array('H')
+    counts.frombytes(buf)
+    if sys.byteorder == 'big':
+        counts.byteswap()
+    return [c/100 for c in counts]
+
+
+def read_bin(fn, as_array=False, header_only=False, data=None, strict=True):
     """Read a trace (*.rgp) stored in the binary format IML used until firmware
     version 1.32.
 
+    If as_array is True drill and feed are returned as numpy float
+    arrays rather than lists. If header_only is True reading stops
+    after the comment blocks; drill and feed are left empty and raw is
+    None. If data (the bytes of fn, or a memoryview or binary file
+    object) is given the file is not opened; fn can also be the data
+    itself. The samples are decoded straight from the buffer.
+
+    A file with an odd number of bytes after the header is an error
+    unless strict is False, in which case the trailing byte is
+    ignored and recorded in settings['trailing_bytes'].
+
     Todo:
     * find an authoritative marker in the data declaring
       the presence of feed force data
@@ -118,10 +262,25 @@ def read_bin(fn):
             # todo: state c/check, tilt sensor, wood inspector, program etc settings
         }
 
+    fn, data = _source(fn, data)
+    if data is not None:
+        raw = None if header_only else data
+        # shares data's buffer rather than copying it
+        f = BytesIO(data)
+    elif header_only:
+        raw = None
+        f = open(fn, 'rb')
+    else:
+        # store the original file as a byte string
+        with open(fn, 'rb') as f:
+            raw = f.read()
+        f = BytesIO(raw)
+
     hdr = {}
     settings = {}
     torques = []
-    with open(fn, 'rb') as f:
+    feeds = []
+    with f:
         for field in [
                 'tooltype',
                 'unknown1',
@@ -165,26 +324,36 @@ def read_bin(fn):
 
         # torque data
         # data stored as a sequence of little-endian 2-byte unsigned int
-        data = f.read()
-        i0 = 0
-        while True:
-            torques.append(unpack('<H', data[i0:i0+2])[0]/100)
-            i0 += 2
-            if i0+2 > len(data):
-                break
-        rem = data[i0:]
-
-    # check that samples/mm * drill_depth = len(torques)
-    assert len(rem) == 0, "%i bytes remain unprocessed" % len(rem)
-    npts = settings['samples_per_mm']*settings['drill_depth']
-    feeds = []
-    if not npts == len(torques):
-        if (len(torques) % npts) == 0:
-            # probably the file contains feed force data
-            feeds = torques[int(npts):]
-            torques = torques[:int(npts)]
-        else:
-            logging.warning("number of data points (%i) does not match samples_per_mm*drill_depth (%i)" % (len(torques), npts))
+        if not header_only:
+            samples = memoryview(raw)[f.tell():]
+            nrem = len(samples) % 2
+            if strict:
+                assert nrem == 0, "%i bytes remain unprocessed" % nrem
+            elif nrem:
+                import logging
+                logging.warning("%i bytes remain unprocessed" % nrem)
+            nsamples = len(samples)//2
+
+    # check that samples/mm * drill_depth = nsamples
+    if not header_only:
+        npts = settings['samples_per_mm']*settings['drill_depth']
+        split = nsamples
+        if not npts == nsamples:
+            if (nsamples % npts) == 0:
+                # probably the file contains feed force data
+                split = int(npts)
+            else:
+                import logging
+                logging.warning("number of data points (%i) does not match samples_per_mm*drill_depth (%i)" % (nsamples, npts))
+        rec = metrics.recorder
+        if rec is not None:
+            t = rec.clock()
+        torques = decode_samples(samples[:2*split], as_array)
+        feeds = decode_samples(samples[2*split:2*nsamples], as_array)
+        if rec is not None:
+            rec.lap('decode_samples', t, 'bin')
+        if nrem:
+            settings['trailing_bytes'] = nrem
 
     # drop fields that are of no interest or that have uncertain
     # correspondence to keys in JSON trace format
@@ -197,10 +366,6 @@ def read_bin(fn):
     settings.pop('level_cm')
     settings.pop('diameter_cm')
 
-    # store the original file as a byte string
-    with open(fn, 'rb') as f:
-        raw = f.read()
-
     return {
         'header': hdr,
         'drill': torques,
@@ -210,9 +375,177 @@ def read_bin(fn):
         }
 
 
-def read_txt1(fn):
+def quantise(values):
+    """Convert profile values to a uint16 array of hundredths.
+
+    Raises ValueError if a value isn't a whole number of hundredths
+    in 0..655.35.
+    """
+    scaled = [x*100 for x in values]
+    counts = [round(x) for x in scaled]
+    for x, c in zip(scaled, counts):
+        if not 0 <= c <= 0xffff or abs(x - c) > 1e-6:
+            raise ValueError('%r cannot be stored in hundredths as uint16' % (x/100))
+    return array('H', counts)
+
+
+def encode_samples(values):
+    """Encode profile values as the block of little-endian 2-byte
+    unsigned ints (hundredths) the binary format stores; the inverse
+    of decode_samples. Raises ValueError as quantise does.
+    """
+    counts = quantise(values)
+    if sys.byteorder == 'big':
+        counts.byteswap()
+    return counts.tobytes()
+
+
+# the (offset, format, key, scale) of the settings read_bin decodes
+BIN_SETTINGS = (
+    (0, '<I', 'max_drill_depth', 10),
+    (4, '<B', 'depth_mode', 1),
+    (5, '<I', 'preselected_depth', 1),
+    (9, '<I', 'drill_depth', 10),
+    (13, '<I', 'feed_speed', 10),
+    (17, '<I', 'drill_resolution', 1),
+    (21, '<B', 'samples_per_mm', 1),  # also read as feed_resolution
+    (29, '<I', 'drill_motor_offset', 1),
+    (33, '<I', 'feed_motor_offset', 1),
+    (60, '<I', 'needle_speed', 1),
+    (64, '<I', 'max_feed_amplitude', 100),
+    (68, '<I', 'max_drill_amplitude', 100),
+)
+
+
+def _bin_blocks(raw):
+    """The parts of a binary trace that read_bin doesn't decode: tool
+    type, unknown1, the 81 byte settings block, unknown2 and the
+    assessment blocks (as bytes)."""
+
+    def skip_string(f):
+        nbytes, = unpack("<B", f.read(1))
+        return f.read(nbytes)
+
+    f = BytesIO(raw)
+    blocks = {}
+    blocks['tooltype'] = skip_string(f)
+    blocks['unknown1'] = skip_string(f)
+    for i in range(6):
+        skip_string(f)
+    f.read(4)
+    skip_string(f)
+    blocks['settings'] = f.read(81)
+    for i in range(4):
+        skip_string(f)
+    blocks['unknown2'] = f.read(108)
+    assessment = []
+    for iass in range(6):
+        b = f.read(8)
+        s = skip_string(f)
+        assessment.append(b + pack('<B', len(s)) + s)
+    blocks['assessment'] = b''.join(assessment)
+    return blocks
+
+
+def write_bin(header, settings, drill, feed, template=None):
+    """Encode a trace in the binary (*.rgp) format that read_bin reads.
+
+    header, settings, drill and feed are as the readers return
+    them. Settings the binary format has no place for (e.g. those
+    only json traces have) are dropped. The parts read_bin doesn't
+    decode (tool type, assessments, abort reason, ...) are copied
+    from template, the bytes of a binary trace, if given; otherwise
+    they are blank. Writing a trace read with read_bin, with its raw
+    as template, gives back the original file.
+
+    Profile values within 1e-6 of a hundredth are stored as that
+    hundredth, missing numbers as 0 and the comment as 6 lines (as
+    read_bin reads it). Raises ValueError if the trace cannot be
+    stored so that read_bin gives back the same values: other profile
+    values or ones outside 0..655.35, strings longer than 255 bytes, or
+    profiles that read_bin would split into drill and feed
+    differently (drill must be samples_per_mm*drill_depth samples
+    long if there is a feed).
+    """
+    if template is not None:
+        blocks = _bin_blocks(template)
+    else:
+        blocks = {
+            'tooltype': b'IML-RESI PD-SERIES',
+            'unknown1': b'\x00\x00\x00',
+            'settings': bytes(81),
+            'unknown2': bytes(108),
+            'assessment': (bytes(8) + b'\x00')*6,
+        }
+
+    def string(s):
+        b = (s or '').encode() if not isinstance(s, bytes) else s
+        if len(b) > 255:
+            raise ValueError('%r is too long for the binary format' % s)
+        return pack('<B', len(b)) + b
+
+    block = bytearray(blocks['settings'])
+    try:
+        for offset, fmt, key, scale in BIN_SETTINGS:
+            pack_into(fmt, block, offset, round((settings.get(key) or 0)*scale))
+        measurement_number = pack('<I', header.get('measurement_number') or 0)
+    except StructError as err:
+        raise ValueError('settings cannot be stored in the binary format: %s' % err)
+
+    comment_lines = (header.get('comment') or '').split('\t')
+    # read_bin joins the 6 lines with tabs, so any extra tabs can stay
+    # in the last one
+    comment_lines = comment_lines[:5] + ['\t'.join(comment_lines[5:])]
+    comment_lines += ['']*(6 - len(comment_lines))
+
+    # check read_bin will split the samples the same way
+    ndrill = len(drill)
+    nsamples = ndrill + (len(feed) if feed is not None else 0)
+    npts = unpack('<B', block[21:22])[0]*unpack('<I', block[9:13])[0]/10.
+    split = nsamples
+    if nsamples and npts != nsamples and npts and nsamples % npts == 0:
+        split = int(npts)
+    if split != ndrill:
+        raise ValueError(
+            '%i drill and %i feed samples would be read back as %i and %i '
+            '(samples_per_mm*drill_depth is %g)' % (
+                ndrill, nsamples - ndrill, split, nsamples - split, npts))
+
+    return b''.join([
+        string(blocks['tooltype']),
+        string(blocks['unknown1']),
+        string(header.get('toolserial')),
+        string(header.get('firmware_version')),
+        string(header.get('SNRelectronic')),
+        string(header.get('hardwareVersion')),
+        string(header.get('date')),
+        string(header.get('time')),
+        measurement_number,
+        string(header.get('description')),
+        bytes(block),
+        string(header.get('direction')),
+        string(header.get('species')),
+        string(header.get('location')),
+        string(header.get('name')),
+        blocks['unknown2'],
+        blocks['assessment'],
+    ] + [string(line) for line in comment_lines] + [
+        encode_samples(drill),
+        encode_samples(feed if feed is not None else []),
+    ])
+
+
+# deleted by str.translate
+_NUMBER_CHARS = dict.fromkeys(map(ord, '0123456789.+-eE'))
+
+
+def read_txt1(fn, header_only=False, data=None):
     """Read a trace (*.txt) exported from PD-Tools in the ASCII format IML used
     in v1.22.
+
+    If header_only is True only the leading header lines are read. If
+    data (the bytes of fn, see read_bin) is given the file is not
+    opened.
     """
 
     def read_settings(lines):
@@ -270,10 +603,60 @@ def read_txt1(fn):
             feed = None
         return drill, feed
 
-    lines = [line.strip() for line in open(fn, 'r')]
-    drill, feed = read_drill_feed(lines)
+    fn, data = _source(fn, data)
+    if header_only:
+        with open_text(fn, data) as f:
+            lines = [line.strip() for line in islice(f, 129)]
+        return {
+            'raw': None,
+            'header': read_header(lines),
+            'drill': [],
+            'feed': [],
+            'settings': read_settings(lines)
+        }
+
+    import re
+    with open_text(fn, data) as f:
+        text = f.read()
+    # iterating over a file doesn't give an empty last line
+    if text.endswith('\n'):
+        text = text[:-1]
+    parts = text.split('\n', 129)
+    lines = [line.strip() for line in parts[:129]]
+    body = parts[129] if len(parts) > 129 else ''
+    drill = feed = None
+    if body and not re.search(r'[^\S\n]', body):
+        # no whitespace to strip, so parse the whole sample section
+        # in one go (drill and feed interleaved if there is a
+        # feed). only if every line checks out; otherwise go line by
+        # line, which raises (or not) exactly as before
+        nlines = body.count('\n') + 1
+        try:
+            if ';' in body.split('\n', 1)[0]:
+                # exactly one ; on every line: with the number
+                # characters deleted only the separators are left
+                if body.translate(_NUMBER_CHARS) == ';\n'*(nlines - 1) + ';':
+                    values = list(map(float, body.replace(';', '\n').split('\n')))
+                    drill = [x/100. for x in values[0::2]]
+                    feed = [x/100. for x in values[1::2]]
+            elif ';' not in body:
+                drill = [x/100. for x in map(int, body.split('\n'))]
+        except ValueError:
+            drill = feed = None
+        # strip() gives back the same string if there was nothing to
+        # strip, in which case raw is just the text
+        if all(a is b for a, b in zip(lines, parts)):
+            raw = text
+        else:
+            raw = '\n'.join(lines) + '\n' + body
+    del parts, body
+    if drill is None:
+        with open_text(fn, data) as f:
+            lines = [line.strip() for line in f]
+        drill, feed = read_drill_feed(lines)
+        raw = "\n".join(lines)
     return {
-        'raw': "\n".join(lines),
+        'raw': raw,
         'header': read_header(lines),
         'drill': drill,
         'feed':  feed,
@@ -281,9 +664,13 @@ def read_txt1(fn):
     }
 
 
-def read_txt2(fn):
+def read_txt2(fn, header_only=False, data=None):
     """Read a trace (*.txt) exported from PD-Tools in the ASCII format IML used
     in v1.67
+
+    If header_only is True only the leading header lines are read and
+    the profile lines are not parsed. If data (the bytes of fn, see
+    read_bin) is given the file is not opened.
     """
 
     def read_settings(lines):
@@ -325,23 +712,50 @@ def read_txt2(fn):
             'comment': lines[9],
         }
 
-    lines = [line.strip() for line in open(fn, 'r')]
+    fn, data = _source(fn, data)
+    if header_only:
+        with open_text(fn, data) as f:
+            lines = [line.strip() for line in islice(f, 257)]
+        return {
+            'raw': None,
+            'header': read_header(lines),
+            'drill': [],
+            'feed': [],
+            'settings': read_settings(lines)
+        }
+
+    with open_text(fn, data) as f:
+        text = f.read()
+    # iterating over a file doesn't give an empty last line
+    if text.endswith('\n'):
+        text = text[:-1]
+    unstripped = text.split('\n')
+    lines = [line.strip() for line in unstripped]
+    # as in read_txt1; the very long sample lines aren't copied again
+    if all(a is b for a, b in zip(lines, unstripped)):
+        raw = text
+    else:
+        raw = "\n".join(lines)
+    del unstripped
     return {
-        'raw': "\n".join(lines),
+        'raw': raw,
         'header': read_header(lines),
-        'drill': [float(x) for x in lines[252].split(",")],
-        'feed': [float(x) for x in lines[253].split(",")],
+        'drill': list(map(float, lines[252].split(","))),
+        'feed': list(map(float, lines[253].split(","))),
         'settings': read_settings(lines)
     }
 
 
-def read_json(fn):
+def read_json(fn, header_only=False, data=None):
     """Read a trace (*.rgp) JSON format IML used in firmwares after 1.32
 
     The .pdc json is very similar, but has fields in 'header' that the
     .rgp version stored in 'app', presumably because they were added
     via the app in a post-processing step???
 
+    If header_only is True "profile" is not decoded; drill and feed
+    are left empty and raw is None. If data (the bytes of fn, see
+    read_bin) is given the file is not opened.
     """
 
     def read_settings(J):
@@ -419,11 +833,14 @@ def read_json(fn):
             }
 
     try:
-        J, raw = load_iml_json(fn)
+        J, raw = load_iml_json(fn, header_only, data)
     except Exception as err:
         raise ValueError(f'{fn}:{err}. Invalid JSON?')
     assert J["device"] == "0F02"
     assert J["version"] == 2
+    if header_only:
+        raw = None
+        J["profile"] = {"drill": [], "feed": []}
 
     # make date and time encoding consistent
     if 'dateDay' in J['header']: # JSON format
@@ -472,8 +889,69 @@ def read_json(fn):
     }
 
 
-def read_pdc(fn):
-    return read_json(fn)
+def read_pdc(fn, header_only=False, data=None):
+    return read_json(fn, header_only, data)
+
+
+def jdata_header(mapdict, meta):
+    """
+    The "header" of a .rgp json trace, with values pulled from meta by
+    the functions in mapdict (keyed by json header key).
+    """
+    header = {
+        "snrMachine": "PD???-????",
+        "verFirmware": "?.??",
+        "memoryId": "????????????",
+        "snrElectronic": "????? ????? ?????",
+        "verElectronic": "?.?? ?.?? ?.??",
+        "dateYear": 0,
+        "dateMonth": 0,
+        "dateDay": 0,
+        "timeHour": 0,
+        "timeMinute": 0,
+        "timeSecond": 0,
+        "number": 0,
+        "idNumber": "?",  # user specified Id string
+        "remark": "?",  # user specified comment string
+        "deviceLength": 0.,
+        "depthMode": 0,
+        "depthPresel": 0.,
+        "depthMsmt": 0.,
+        "ampMaxFeed": 0.,
+        "ampMaxDrill": 0.,
+        "abortState": 0,
+        "feedOn": 0,
+        "ncOn": 0,
+        "ncState": 0,
+        "tiltOn": 0,
+        "tiltRelOn": 0,
+        "tiltRelAngle": 0.0,
+        "tiltAngle": 0.0,
+        "diameter": 0.0,
+        "offsetDrill": 0,
+        "offsetFeed": 0,
+        "resolutionAmp": 0,
+        "speedFeed": 0.,
+        "speedDrill": 0,
+        "resolutionFeed": 0,
+        "wiInstalled": 0,
+        "wi": {
+            # ...
+        }
+    }
+
+    for k in header.keys():
+        if k not in mapdict:
+            continue
+        f = mapdict[k]
+        if not f:
+            continue
+        try:
+            header[k] = f(meta)
+        except KeyError:
+            header[k] = None
+
+    return header
 
 
 def create_jdata(mapdict, meta, data):
@@ -492,47 +970,7 @@ def create_jdata(mapdict, meta, data):
         # so far everything I've seen has device=0F02 and version=2
         "device": "0F02",
         "version": 2,
-        "header": {
-            "snrMachine": "PD???-????",
-            "verFirmware": "?.??",
-            "memoryId": "????????????",
-            "snrElectronic": "????? ????? ?????",
-            "verElectronic": "?.?? ?.?? ?.??",
-            "dateYear": 0,
-            "dateMonth": 0,
-            "dateDay": 0,
-            "timeHour": 0,
-            "timeMinute": 0,
-            "timeSecond": 0,
-            "number": 0,
-            "idNumber": "?",  # user specified Id string
-            "remark": "?",  # user specified comment string
-            "deviceLength": 0.,
-            "depthMode": 0,
-            "depthPresel": 0.,
-            "depthMsmt": 0.,
-            "ampMaxFeed": 0.,
-            "ampMaxDrill": 0.,
-            "abortState": 0,
-            "feedOn": 0,
-            "ncOn": 0,
-            "ncState": 0,
-            "tiltOn": 0,
-            "tiltRelOn": 0,
-            "tiltRelAngle": 0.0,
-            "tiltAngle": 0.0,
-            "diameter": 0.0,
-            "offsetDrill": 0,
-            "offsetFeed": 0,
-            "resolutionAmp": 0,
-            "speedFeed": 0.,
-            "speedDrill": 0,
-            "resolutionFeed": 0,
-            "wiInstalled": 0,
-            "wi": {
-                # ...
-            }
-        },
+        "header": jdata_header(mapdict, meta),
         "profile": {
             'drill': [],
             'feed': []
@@ -553,22 +991,74 @@ def create_jdata(mapdict, meta, data):
             if data[k] is not None:
                 rgp['profile'][k] = list(map(float, data[k]))
         except KeyError:
+            import logging
             logging.warning("missing %s data" % k)
 
-    for k in rgp['header'].keys():
-        if k not in mapdict:
-            continue
-        f = mapdict[k]
-        if not f:
-            continue
-        try:
-            rgp['header'][k] = f(meta)
-        except KeyError:
-            rgp['header'][k] = None
-
     return rgp
 
 
+def dump_floats(values, chunksize=65536):
+    """Yield the minified json array of values (as floats) in pieces.
+
+    The joined pieces are identical to json.dumps(list(map(float,
+    values))) but only chunksize values are converted at a time.
+    """
+    import ujson as json
+    if len(values) <= chunksize:
+        yield json.dumps(list(map(float, values)))
+        return
+    yield '['
+    sep = ''
+    for i in range(0, len(values), chunksize):
+        yield sep + json.dumps(list(map(float, values[i:i+chunksize])))[1:-1]
+        sep = ','
+    yield ']'
+
+
+# Maps json header keys to a function that will pull the
+# corresponding value from a trace's (merged) header and settings. I
+# can't remember why I'm doing this such a weird way, but there's
+# probably a rooted-in-history reason.
+JSON_HEADER_MAP = {
+    "snrMachine": lambda x: x['toolserial'],
+    "verFirmware": lambda x: x['firmware_version'],
+    # "memoryId": "????????????",
+    "snrElectronic": lambda x: x['SNRelectronic'],
+    "verElectronic": lambda x: x['hardwareVersion'],
+    "dateYear": lambda x: int(x['date'].split('.')[2]),
+    "dateMonth": lambda x: int(x['date'].split('.')[1]),
+    "dateDay": lambda x: int(x['date'].split('.')[0]),
+    "timeHour": lambda x: int(x['time'].split(':')[0]),
+    "timeMinute": lambda x: int(x['time'].split(':')[1]),
+    "timeSecond": lambda x: int(x['time'].split(':')[2]),
+    "number": lambda x: x['measurement_number'],
+    "idNumber": lambda x: x['description'],
+    # "remark": "",  # user specified comment string
+    "deviceLength": lambda x: x['max_drill_depth'],  # ??????
+    "depthMode": lambda x: x['depth_mode'],
+    "depthMsmt": lambda x: x['drill_depth'],  # ??????
+    "ampMaxFeed": lambda x: x['max_feed_amplitude'],
+    "ampMaxDrill": lambda x: x['max_drill_amplitude'],
+    #"abortState": lambda x: x['abort_reason'],
+    "feedOn": lambda x: x['feedOn'],
+    "ncOn": lambda x: x['ncOn'],
+    "ncState": lambda x: x['ncState'],
+    "tiltOn": lambda x: x['tiltOn'],
+    "tiltRelOn": lambda x: x['tiltRelOn'],
+    "tiltRelAngle": lambda x: x['tiltRelAngle'],
+    "tiltAngle": lambda x: x['tiltAngle'],
+    #"diameter": lambda x: x['diameter_cm'],  ### WRONG
+    "offsetDrill": lambda x: x['drill_motor_offset'],
+    "offsetFeed": lambda x: x['feed_motor_offset'],
+    "resolutionAmp": lambda x: x['drill_resolution'],
+    "speedFeed": lambda x: x['feed_speed'],
+    "speedDrill": lambda x: x['needle_speed'],
+    #"resolutionFeed": lambda x: x['samples_per_mm'],
+    "resolutionFeed": lambda x: x['feed_resolution'],
+    "depthPresel": lambda x: x['preselected_depth'],
+}
+
+
 class Trace():
 
     def __init__(self, json_string=None):
@@ -612,12 +1102,44 @@ class Trace():
 
         return s
 
+    def __setattr__(self, name, value):
+        # (re)assigning anything invalidates the memoised to_json()
+        self.__dict__['_json'] = None
+        self.__dict__[name] = value
+
     def __repr__(self):
-        return "%s(%r)" % (self.__class__, self.__dict__)
+        return "%s(%r)" % (self.__class__, {
+            k: v for k, v in self.__dict__.items() if not k.startswith('_')
+        })
 
-    def read(self, trace_filename):
+    def read(self, trace_filename, header_only=False, data=None, cache=None, strict=True, fmt=None):
         """Read a trace from file.
 
+        If header_only is True only header and settings are read; the
+        drill and feed profiles are left empty and raw is None. This
+        is much cheaper when only metadata (get_resiId, get_drilltime,
+        get_instrument, ...) is needed. to_json() and hash() then
+        raise ValueError.
+
+        The file is read from disk once and the same bytes are used for
+        format identification and parsing. If data (the bytes of
+        trace_filename) is given the file is not opened at all.
+
+        trace_filename can also be the trace itself: bytes, a
+        memoryview or a binary file object (e.g. a request body), in
+        which case trace_filename becomes the file object's name, or
+        None. Nothing needs writing to a temporary file first, and a
+        binary trace is decoded from the buffer without copying it.
+
+        If cache (a cache.TraceCache) is given the parsed trace is
+        looked up there first and stored there after parsing.
+
+        strict=False tolerates trailing rubbish in binary traces (see
+        read_bin); such reads bypass the cache.
+
+        fmt skips format identification, e.g. for formats added
+        through the reader registry (see readers.py).
+
         File Formats:
 
         - "bin" - a binary format for traces (*.rgp files) downloaded from
@@ -627,23 +1149,68 @@ class Trace():
         - "txt1" - txt format exported by PD-Tools v 1.22
         - "txt2" - txt format exported by PD-Tools v 1.67
         """
+        rec = metrics.recorder
+        if rec is not None:
+            rec.start_file()
+            t = rec.clock()
+        if data is None and is_data(trace_filename):
+            data = trace_filename
+            name = getattr(data, 'name', None)
+            trace_filename = name if isinstance(name, str) else None
+        if data is not None:
+            data = as_bytes(data)
         self.trace_filename = trace_filename
-        self.trace_format = identify_format(self.trace_filename)
-        read = {
-            'bin':  read_bin,
-            'json': read_json,
-            'pdc':  read_pdc,
-            'txt1': read_txt1,
-            'txt2': read_txt2,
-            }[self.trace_format]
-        res = read(self.trace_filename)
+        key = res = None
+        # a trace from memory can only be cached by its contents
+        if cache is not None and not header_only and strict and (
+                trace_filename is not None or cache.content_hash):
+            key, data = cache.key(trace_filename, data, fmt)
+            res = cache.get(key)
+            if rec is not None:
+                t = rec.lap('cache_lookup', t)
+        if res is None:
+            if data is None and not header_only:
+                with open(trace_filename, 'rb') as f:
+                    data = f.read()
+                if rec is not None:
+                    t = rec.lap('read_file', t)
+            from imlresi.readers import get_reader
+            if fmt is None:
+                fmt = identify_format(self.trace_filename, data)
+                if rec is not None:
+                    t = rec.lap('identify_format', t)
+            read = get_reader(fmt)
+            # only the binary reader has anything to be lenient about
+            kwargs = {'strict': False} if not strict and fmt == 'bin' else {}
+            res = read(self.trace_filename, header_only=header_only, data=data, **kwargs)
+            res['format'] = fmt
+            if rec is not None:
+                t = rec.lap('parse', t, fmt)
+            if key is not None:
+                cache.put(key, res)
+        if rec is not None:
+            rec.end_file(
+                trace_filename, res['format'],
+                len(data) if data is not None else 0,
+                len(res['drill']) + len(res['feed'] if res['feed'] is not None else []),
+            )
+        self.trace_format = res['format']
+        self.header_only = header_only
         self.raw = res['raw']
         self.header = res['header']
         self.settings = res['settings']
         self.drill = res['drill']
         self.feed = res['feed']
 
-    def hash(self):
+    async def aread(self, path_or_stream, executor=None, **kwargs):
+        """Read a trace from a file or stream without blocking the
+        event loop (see aio.aread)."""
+        from .aio import aread
+        tr = await aread(path_or_stream, executor, **kwargs)
+        self.__dict__.update(tr.__dict__)
+
+    def hash(self, cache=False):
+        """The md5 of to_json(). cache is passed to to_json()."""
         # use md5 (rather than sha256 for example) only because it creates
         # a 128-bit hash which neatly fits in a postgres uuid column
         import hashlib
@@ -657,9 +1224,39 @@ class Trace():
         # was originally in "json" format this will use original data
         # (put through a load-dump cycle to make consistent) otherwise
         # it will use a converted representation
-        return hashlib.md5(
-            self.to_json().encode('utf-8')
+        rec = metrics.recorder
+        if rec is not None:
+            t = rec.clock()
+        h = hashlib.md5(
+            self.to_json(cache).encode('utf-8')
         ).hexdigest()
+        if rec is not None:
+            rec.lap('hash', t, self.trace_format)
+        return h
+
+    def fingerprint(self):
+        """A hash of what was measured, independent of file format.
+
+        hash() depends on the format a trace arrived in (a binary .rgp
+        and its PD-Tools json re-export hash differently). This uses
+        only the instrument serial, measurement number, drill time
+        and the drill/feed profiles quantised to 0.01, so the same
+        measurement gets the same fingerprint whichever format it was
+        read from. Like hash() it is an md5 hex digest.
+        """
+        import hashlib
+        h = hashlib.md5(('%s|%i|%s|' % (
+            self.get_instrument(),
+            int(self.get_measnumber()),
+            self.get_drilltime().isoformat(),
+        )).encode('utf-8'))
+        for values in (self.drill, self.feed):
+            counts = array('i', [round(x*100) for x in (values if values is not None else [])])
+            if sys.byteorder == 'big':
+                counts.byteswap()
+            h.update(b'%i|' % len(counts))
+            h.update(counts.tobytes())
+        return h.hexdigest()
 
     def get_resiId(self):
         return self.header['description']
@@ -722,70 +1319,91 @@ class Trace():
     def get_measnumber(self):
         return self.header['measurement_number']
 
-    def to_json(self):
+    def get_samples_per_mm(self):
+        """Samples per mm of depth, falling back to the number of
+        samples over drill_depth if samples_per_mm isn't set."""
+        spm = self.settings.get('samples_per_mm')
+        if not spm:
+            spm = len(self.drill)/self.settings['drill_depth']
+        return spm
+
+    def get_depth(self):
+        """The depth (mm) of each drill/feed sample, as a numpy array."""
+        import numpy as np
+        return np.arange(len(self.drill))/self.get_samples_per_mm()
+
+    def to_json(self, cache=False):
         """Regenerate a json format trace.
 
         Ideally the output of this should be able to be read back into
         PD-Tools. Currently it cannot.
+
+        With cache=True the result is memoised (and a memoised result
+        returned) until an attribute of the trace is assigned to or
+        touch() is called. Changes made in place (e.g. to header or
+        drill) are not noticed, so only use it for traces that aren't
+        being changed. By default it is computed afresh every time.
+        """
+        s = self.__dict__.get('_json') if cache else None
+        if s is None:
+            rec = metrics.recorder
+            if rec is not None:
+                t = rec.clock()
+            s = ''.join(self.iter_json())
+            if rec is not None:
+                rec.lap('to_json', t, self.trace_format)
+            if cache:
+                self.__dict__['_json'] = s
+        return s  # this is a str *NOT* bytes
+
+    def touch(self):
+        """Forget the to_json(cache=True) output."""
+        self.__dict__['_json'] = None
+
+    def iter_json(self):
+        """Yield the to_json() output in pieces.
+
+        For traces not originally in a json format the output is
+        written straight from header, settings and profiles; this is
+        the same as json.dumps(create_jdata(JSON_HEADER_MAP, ...)).
         """
+        if self.__dict__.get('header_only'):
+            raise ValueError('only the header of %s was read; read it in full for to_json()/hash()' % self.trace_filename)
+        import ujson as json
         if self.trace_format in ("json", "pdc"):
-            J = json.loads(self.raw)
-        else:
-            J = create_jdata(
-                # This arg is a dict that maps output field to a
-                # funtion that will pull the corresponding value from
-                # the trace object. I can't remember why I'm doing
-                # this such a weird way, but there's probably a
-                # rooted-in-history reason.
-                {
-                    "snrMachine": lambda x: x['toolserial'],
-                    "verFirmware": lambda x: x['firmware_version'],
-                    # "memoryId": "????????????",
-                    "snrElectronic": lambda x: x['SNRelectronic'],
-                    "verElectronic": lambda x: x['hardwareVersion'],
-                    "dateYear": lambda x: int(x['date'].split('.')[2]),
-                    "dateMonth": lambda x: int(x['date'].split('.')[1]),
-                    "dateDay": lambda x: int(x['date'].split('.')[0]),
-                    "timeHour": lambda x: int(x['time'].split(':')[0]),
-                    "timeMinute": lambda x: int(x['time'].split(':')[1]),
-                    "timeSecond": lambda x: int(x['time'].split(':')[2]),
-                    "number": lambda x: x['measurement_number'],
-                    "idNumber": lambda x: x['description'],
-                    # "remark": "",  # user specified comment string
-                    "deviceLength": lambda x: x['max_drill_depth'],  # ??????
-                    "depthMode": lambda x: x['depth_mode'],
-                    "depthMsmt": lambda x: x['drill_depth'],  # ??????
-                    "ampMaxFeed": lambda x: x['max_feed_amplitude'],
-                    "ampMaxDrill": lambda x: x['max_drill_amplitude'],
-                    #"abortState": lambda x: x['abort_reason'],
-                    "feedOn": lambda x: x['feedOn'],
-                    "ncOn": lambda x: x['ncOn'],
-                    "ncState": lambda x: x['ncState'],
-                    "tiltOn": lambda x: x['tiltOn'],
-                    "tiltRelOn": lambda x: x['tiltRelOn'],
-                    "tiltRelAngle": lambda x: x['tiltRelAngle'],
-                    "tiltAngle": lambda x: x['tiltAngle'],
-                    #"diameter": lambda x: x['diameter_cm'],  ### WRONG
-                    "offsetDrill": lambda x: x['drill_motor_offset'],
-                    "offsetFeed": lambda x: x['feed_motor_offset'],
-                    "resolutionAmp": lambda x: x['drill_resolution'],
-                    "speedFeed": lambda x: x['feed_speed'],
-                    "speedDrill": lambda x: x['needle_speed'],
-                    #"resolutionFeed": lambda x: x['samples_per_mm'],
-                    "resolutionFeed": lambda x: x['feed_resolution'],
-                    "depthPresel": lambda x: x['preselected_depth'],
-                },
-                {
-                    **self.header,
-                    **self.settings
-                },
-                {
-                    'drill': self.drill,
-                    'feed': self.feed
-                }
-            )
-
-        return json.dumps(J)  # this is a str *NOT* bytes
+            if self.raw is None:
+                raise ValueError('%s has no raw json to convert' % self.trace_filename)
+            yield json.dumps(json.loads(self.raw))
+            return
+
+        yield '{"device":"0F02","version":2,"header":'
+        yield json.dumps(jdata_header(JSON_HEADER_MAP, {
+            **self.header,
+            **self.settings
+        }))
+        yield ',"profile":{"drill":'
+        yield from dump_floats(self.drill if self.drill is not None else [])
+        yield ',"feed":'
+        yield from dump_floats(self.feed if self.feed is not None else [])
+        yield '},"wiPoleResult":{},"app":{},"assessment":{}}'
+
+    def to_rgp_bin(self, fp=None):
+        """The trace in the binary (*.rgp) format (see write_bin), at 2
+        bytes/sample. Returned as bytes, or written to the binary file
+        object fp.
+
+        A trace read from a binary file gives back that file."""
+        template = self.raw if self.trace_format == 'bin' and isinstance(self.raw, bytes) else None
+        b = write_bin(self.header, self.settings, self.drill, self.feed, template)
+        if fp is None:
+            return b
+        fp.write(b)
+
+    def write_json(self, fp):
+        """Write the to_json() output to a text file object without
+        building it in memory."""
+        for s in self.iter_json():
+            fp.write(s)
 
     def plot(self, axs=None):
         if axs is None:
@@ -796,9 +1414,15 @@ class Trace():
 
         return axs
 
+def write_jsonl(traces, fp):
+    """Write traces to a text file object as json lines."""
+    for tr in traces:
+        tr.write_json(fp)
+        fp.write('\n')
+
+
 if __name__ == "__main__":
 
-    import sys
     tr = Trace()
     tr.read(sys.argv[1])
     print(tr.to_json())
@@ -0,0 +1,13 @@
+import pytest
+from imlresi import trace
+
+
+@pytest.fixture
+def read():
+    """A function reading a trace file into a Trace, passing any
+    keyword arguments to Trace.read()."""
+    def read(fn, **kwargs):
+        tr = trace.Trace()
+        tr.read(fn, **kwargs)
+        return tr
+    return read
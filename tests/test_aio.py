@@ -0,0 +1,68 @@
+import asyncio
+from io import BytesIO
+
+from imlresi import trace
+from imlresi.aio import aread, aread_many
+
+
+FILENAMES = [
+    'tests/data/1-131-withfeed.rgp',
+    'tests/data/2-178-withfeed.pdc',
+    'tests/data/3-131-nofeed.rgp',
+    'tests/data/missing.rgp',
+]
+
+
+def test_aread(tmp_path, read):
+    expected = read(FILENAMES[0])
+
+    async def main():
+        tr = await aread(FILENAMES[0])
+        assert tr.hash() == expected.hash()
+
+        with open(FILENAMES[0], 'rb') as f:
+            tr = await aread(f)
+        assert tr.hash() == expected.hash()
+        assert tr.trace_filename == FILENAMES[0]
+
+        # a cache keyed on path+mtime can't be used for an unnamed
+        # stream, so it is bypassed rather than stat'ing a made-up name
+        from imlresi.cache import TraceCache
+        tr = await aread(BytesIO(expected.raw), cache=TraceCache(tmp_path / 'cache'))
+        assert tr.hash() == expected.hash()
+
+        # an async stream
+        reader = asyncio.StreamReader()
+        with open(FILENAMES[0], 'rb') as f:
+            reader.feed_data(f.read())
+        reader.feed_eof()
+        tr = trace.Trace()
+        await tr.aread(reader)
+        assert tr.hash() == expected.hash()
+        assert tr.trace_filename is None
+
+    asyncio.run(main())
+
+
+def test_aread_many(read):
+
+    async def uploads():
+        for fn in FILENAMES:
+            await asyncio.sleep(0)
+            yield fn
+
+    async def main(items, **kwargs):
+        return [res async for res in aread_many(items, **kwargs)]
+
+    results = asyncio.run(main(uploads(), max_in_flight=2))
+    assert [r.filename for r in results] == FILENAMES
+    for res in results[:-1]:
+        assert res.error is None
+        assert res.trace.hash() == read(res.filename).hash()
+    assert results[-1].trace is None and 'FileNotFoundError' in results[-1].error
+
+    with open(FILENAMES[1], 'rb') as f:
+        data = f.read()
+    results = asyncio.run(main([BytesIO(data)] + FILENAMES[:1], max_in_flight=1, ordered=False))
+    assert [r.filename for r in results] == [None, FILENAMES[0]]
+    assert results[0].trace.hash() == read(FILENAMES[1]).hash()
@@ -0,0 +1,71 @@
+from glob import glob
+import io
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+from imlresi import archive, batch, cache
+
+
+def make_archives(tmp_path):
+    fns = sorted(glob('tests/data/*'))
+    zfn = str(tmp_path / 'season.zip')
+    with zipfile.ZipFile(zfn, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('site1/', '')
+        for fn in fns:
+            zf.write(fn, 'site1/' + os.path.basename(fn))
+        zf.writestr('__MACOSX/site1/._2-178-withfeed.pdc', b'\x00\x05\x16\x07')
+    tfn = str(tmp_path / 'season.tar.gz')
+    with tarfile.open(tfn, 'w:gz') as tf:
+        for fn in fns:
+            tf.add(fn, 'site1/' + os.path.basename(fn))
+    return fns, zfn, tfn
+
+
+def test_members(tmp_path):
+    fns, zfn, tfn = make_archives(tmp_path)
+    for afn in (zfn, tfn):
+        m = list(archive.members(afn))
+        assert [name for name, _ in m] == ['site1/' + os.path.basename(fn) for fn in fns]
+        for (_, data), fn in zip(m, fns):
+            with open(fn, 'rb') as f:
+                assert data == f.read()
+        assert [name for name, _ in archive.members(afn, '*.pdc')] == ['site1/2-178-withfeed.pdc']
+    # a tar can be streamed from something that can't seek
+    with open(tfn, 'rb') as f:
+        stream = io.BufferedReader(io.BytesIO(f.read()))
+    stream.seekable = lambda: False
+    assert not archive.is_zip(stream)
+    assert len(list(archive.members(stream, '*.rgp'))) == 8
+
+
+def test_read_archive(tmp_path):
+    fns, zfn, tfn = make_archives(tmp_path)
+    expected = list(batch.read_many(fns, workers=1))
+    for fn in (zfn, tfn):
+        for kwargs in (
+                {'workers': 1},
+                {'workers': 2, 'executor': 'process'},
+        ):
+            stats = batch.ReadStats()
+            res = list(archive.read_archive(fn, stats=stats, **kwargs))
+            assert [r.filename for r in res] == [fn + '/site1/' + os.path.basename(e.filename) for e in expected]
+            assert stats.files == len(fns) and stats.failures == 1
+            for r, e in zip(res, expected):
+                assert (r.error is None) == (e.error is None)
+                if e.trace is not None:
+                    assert r.trace.trace_format == e.trace.trace_format
+                    assert r.trace.to_json() == e.trace.to_json()
+
+    with open(zfn, 'rb') as f:
+        res = list(archive.read_archive(f, '*.pdc', workers=1))
+    assert [r.filename for r in res] == [zfn + '/site1/2-178-withfeed.pdc']
+
+    tc = cache.TraceCache(str(tmp_path / 'cache'), content_hash=True)
+    res = list(archive.read_archive(zfn, '*.pdc', workers=1, cache=tc))
+    res = list(archive.read_archive(zfn, '*.pdc', workers=1, cache=tc))
+    assert tc.hits == 1
+    with pytest.raises(ValueError):
+        list(archive.read_archive(zfn, workers=1, cache=cache.TraceCache(str(tmp_path / 'cache2'))))
@@ -0,0 +1,40 @@
+from glob import glob
+from imlresi import batch, trace
+
+
+def test_read_many():
+    fns = sorted(glob('tests/data/*'))
+    for kwargs in (
+            {'workers': 1},
+            {'workers': 2, 'executor': 'thread'},
+            {'workers': 2, 'executor': 'process'},
+    ):
+        stats = batch.ReadStats()
+        res = list(batch.read_many(fns, stats=stats, **kwargs))
+        assert [r.filename for r in res] == fns
+        assert stats.files == len(fns)
+        # the trailing rubbish in this one trips an assert in read_bin
+        assert stats.failures == 1
+        for r in res:
+            if r.filename.endswith('withtrailingrubbish.rgp'):
+                assert r.trace is None
+                assert r.error.startswith('AssertionError')
+            else:
+                tr = trace.Trace()
+                tr.read(r.filename)
+                assert r.error is None
+                assert r.trace.to_json() == tr.to_json()
+
+
+def test_read_dir():
+    res = list(batch.read_dir('tests', '*.pdc', recursive=True, workers=2, ordered=False))
+    assert [r.filename for r in res] == ['tests/data/2-178-withfeed.pdc']
+    assert res[0].trace.get_resiId() == 'TEST 7'
+
+
+def test_read_many_hash():
+    fns = sorted(glob('tests/data/*.pdc'))
+    for kwargs in ({'workers': 1}, {'workers': 2, 'executor': 'process'}):
+        res = list(batch.read_many(fns, hash=True, **kwargs))
+        assert [r.hash for r in res] == [r.trace.hash() for r in res]
+    assert list(batch.read_many(fns, workers=1))[0].hash is None
@@ -0,0 +1,56 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+from imlresi import trace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+import bench  # noqa: E402
+import synth  # noqa: E402
+
+
+@pytest.mark.parametrize('fmt', synth.FORMATS)
+@pytest.mark.parametrize('feed', [True, False])
+def test_synth(tmp_path, fmt, feed):
+    if fmt == 'txt2' and not feed:
+        with pytest.raises(ValueError):
+            synth.generate(str(tmp_path), fmt, 1, feed=feed)
+        return
+    fns = synth.generate(str(tmp_path), fmt, 2, depth_mm=123.4, spm=25, feed=feed, seed=1)
+    drill, feed = synth.profiles(3085, 25, feed, np.random.default_rng(1))
+    tr = trace.Trace()
+    tr.read(fns[0])
+    assert tr.trace_format == fmt
+    assert tr.settings['drill_depth'] == 123.4
+    assert tr.settings['samples_per_mm'] == 25
+    assert tr.drill == (drill/100).tolist()
+    if feed is None:
+        assert not tr.feed
+    else:
+        assert tr.feed == (feed/100).tolist()
+
+
+@pytest.mark.parametrize('depth_mm, spm', [(123.3, 25), (123.45, 10), (100., 2.5), (100., 256)])
+def test_synth_rejects(tmp_path, depth_mm, spm):
+    # samples read_bin() couldn't split into drill and feed
+    with pytest.raises(ValueError):
+        synth.generate(str(tmp_path), 'bin', 1, depth_mm=depth_mm, spm=spm)
+    assert not os.path.exists(str(tmp_path/'bin-000000.rgp'))
+
+
+@pytest.mark.parametrize('depth_mm, spm', [(123.4, 25), (0.1, 10), (999.9, 10), (40., 255)])
+def test_synth_bin_matches_json(tmp_path, depth_mm, spm):
+    # the bin traces read back the same as their json twins
+    bin_tr, json_tr = trace.Trace(), trace.Trace()
+    bin_tr.read(synth.generate(str(tmp_path), 'bin', 1, depth_mm=depth_mm, spm=spm)[0])
+    json_tr.read(synth.generate(str(tmp_path), 'json', 1, depth_mm=depth_mm, spm=spm)[0])
+    assert len(bin_tr.drill) == round(depth_mm*spm)
+    assert bin_tr.drill == json_tr.drill
+    assert bin_tr.feed == json_tr.feed
+
+
+def test_bench(tmp_path):
+    fn = str(tmp_path/'results.json')
+    assert bench.main(['--files', '2', '--depths', '10', '--repeat', '1', '--output', fn]) == 0
+    assert bench.main(['--compare', fn, fn]) == 0
@@ -0,0 +1,56 @@
+import shutil
+from imlresi import trace
+from imlresi.cache import TraceCache
+
+
+fns = [
+    'tests/data/1-131-withfeed-json.rgp',
+    'tests/data/1-131-withfeed.rgp',
+    'tests/data/1-131-withfeed-txt1.txt',
+    'tests/data/1-131-withfeed-txt2.txt',
+    'tests/data/2-178-withfeed.pdc',
+    'tests/data/3-131-nofeed.rgp',
+]
+
+
+def test_TraceCache(tmp_path):
+    cache = TraceCache(tmp_path / 'cache')
+    for fn in fns:
+        tr = trace.Trace()
+        tr.read(fn)
+        for i in range(2):
+            cached = trace.Trace()
+            cached.read(fn, cache=cache)
+            assert cached.__dict__ == tr.__dict__
+    assert cache.misses == len(fns)
+    assert cache.hits == len(fns)
+
+
+def test_TraceCache_content_hash(tmp_path):
+    cache = TraceCache(tmp_path / 'cache', content_hash=True)
+    tr = trace.Trace()
+    tr.read(fns[0], cache=cache)
+    # a copy has the same content, so it hits
+    shutil.copy(fns[0], tmp_path / 'copy.rgp')
+    tr.read(str(tmp_path / 'copy.rgp'), cache=cache)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_TraceCache_evict(tmp_path):
+    cache = TraceCache(tmp_path / 'cache', max_bytes=0)
+    tr = trace.Trace()
+    tr.read(fns[0], cache=cache)
+    tr.read(fns[0], cache=cache)
+    assert cache.hits == 0
+    assert cache.evictions == 2
+    assert cache.nbytes == 0
+
+
+def test_TraceCache_overwrite(tmp_path):
+    cache = TraceCache(tmp_path / 'cache')
+    res = trace.read_bin(fns[1])
+    cache.put('k', res)
+    nbytes = cache.nbytes
+    cache.put('k', res)
+    assert cache.nbytes == nbytes
+    assert cache.nbytes == TraceCache(tmp_path / 'cache').nbytes
@@ -0,0 +1,84 @@
+from glob import glob
+import numpy as np
+from imlresi import trace
+from imlresi.checks import check, longest_run
+from imlresi.collection import TraceCollection
+
+
+def synthetic(drill, feed=(), **settings):
+    tr = trace.Trace()
+    tr.settings = {'samples_per_mm': 10., 'drill_depth': len(drill)/10., **settings}
+    tr.drill = list(drill)
+    tr.feed = list(feed)
+    return tr
+
+
+def test_check_rules():
+    ramp = np.linspace(1, 30, 200)
+    clipped = np.minimum(ramp, 20.)
+    hole = ramp.copy()
+    hole[50:160] = 0.
+    traces = [
+        synthetic(ramp, ramp),
+        synthetic(clipped),
+        synthetic(ramp, clipped),
+        synthetic(hole),
+        synthetic(ramp, ramp[:-1]),
+        synthetic(ramp, drill_depth=25.),
+        synthetic(ramp, abortState=1),
+        synthetic(ramp, trailing_bytes=1),
+    ]
+    flags = check(traces)
+    expected = {
+        'overload_drill': 1,
+        'overload_feed': 2,
+        'underload': 3,
+        'sample_count': (4, 5),
+        'abort': 6,
+        'trailing_bytes': 7,
+    }
+    for rule, i in expected.items():
+        assert np.flatnonzero(flags[rule]).tolist() == list(np.atleast_1d(i)), rule
+    assert np.flatnonzero(flags['ok']).tolist() == [0]
+
+    flags = check(traces, {'underload': {'min_mm': 12.}})
+    assert list(flags) == ['underload', 'ok']
+    assert not flags['underload'].any()
+
+
+def test_longest_run():
+    tc = TraceCollection.from_traces([
+        synthetic([0, 0, 1, 0, 0, 0]),
+        synthetic([0, 0, 1]),  # run at the end of one trace...
+        synthetic([0, 1, 1, 0]),  # ... doesn't continue into the next
+        synthetic([]),
+    ])
+    assert longest_run(tc, tc.drill == 0).tolist() == [3, 2, 1, 0]
+
+
+def test_check_data():
+    traces = []
+    for fn in sorted(glob('tests/data/*')):
+        tr = trace.Trace()
+        tr.read(fn, strict=False)
+        traces.append(tr)
+    flags = check(traces)
+    bad = [fn for fn, ok in zip(sorted(glob('tests/data/*')), flags['ok']) if not ok]
+    assert bad == [
+        'tests/data/3-131-nofeed.rgp',
+        'tests/data/6-131-nofeed-withtrailingrubbish.rgp',
+    ]
+    assert flags['trailing_bytes'][-1] and flags['sample_count'][-1]
+
+
+def test_check_empty():
+    flags = check([])
+    assert set(flags) > {'ok', 'sample_count'}
+    assert all(f.dtype == bool and f.size == 0 for f in flags.values())
+
+    # no samples_per_mm anywhere: nothing to compare the counts with
+    tr = trace.Trace()
+    tr.read('tests/data/3-131-nofeed.rgp')
+    tr.settings = {k: v for k, v in tr.settings.items() if k != 'samples_per_mm'}
+    flags = check([tr])
+    assert not flags['sample_count'][0] and not flags['underload'][0]
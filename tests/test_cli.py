@@ -0,0 +1,113 @@
+import csv
+import os
+
+import ujson as json
+from imlresi.cli import main
+from imlresi.compact import load
+
+
+def test_convert_json(tmp_path, read):
+    out = str(tmp_path/'out')
+    assert main(['convert', '-q', '-j', '1', '-o', out, 'tests/data/*-withfeed.rgp', 'tests/data/2-178-withfeed.pdc']) == 0
+    assert sorted(os.listdir(out)) == [
+        '1-131-withfeed.json',
+        '2-178-withfeed.json',
+        '4-131-withfeed.json',
+        '5-132-withfeed.json',
+    ]
+    with open(os.path.join(out, '2-178-withfeed.json')) as f:
+        assert json.load(f) == json.loads(read('tests/data/2-178-withfeed.pdc').to_json())
+
+
+def test_convert_compact(tmp_path, read):
+    out = str(tmp_path/'out')
+    # the file with trailing rubbish fails unless --lenient
+    assert main(['convert', '-q', '-j', '1', '-f', 'compact', '-o', out, 'tests/data']) == 1
+    assert main(['convert', '-q', '-j', '2', '-f', 'compact', '--lenient', '-o', out, 'tests/data']) == 0
+    traces = load(os.path.join(out, 'traces.npz'))
+    assert len(traces) == len(os.listdir('tests/data'))
+    tr = traces[[t.trace_filename for t in traces].index('tests/data/3-131-nofeed.rgp')]
+    expected = read('tests/data/3-131-nofeed.rgp')
+    assert tr.drill == expected.drill
+    assert tr.get_resiId() == expected.get_resiId()
+
+
+def test_index_and_check(tmp_path):
+    fn = str(tmp_path/'index.csv')
+    assert main(['index', '-q', '-j', '1', '-o', fn, 'tests/data/1-131-*']) == 0
+    with open(fn, newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == 6
+    assert {r['toolserial'] for r in rows} == {'PD400-0468'}
+
+    fn = str(tmp_path/'check.csv')
+    assert main(['check', '-q', '-j', '1', '-o', fn, 'tests/data']) == 0
+    with open(fn, newline='') as f:
+        rows = {r['trace_filename']: r for r in csv.DictReader(f)}
+    assert rows['tests/data/6-131-nofeed-withtrailingrubbish.rgp']['trailing_bytes'] == '1'
+    assert rows['tests/data/1-131-withfeed.rgp']['ok'] == '1'
+
+
+def test_convert_rgp(tmp_path, read):
+    out = str(tmp_path/'out')
+    assert main(['convert', '-q', '-j', '1', '-f', 'rgp', '-o', out, 'tests/data/2-178-withfeed.pdc']) == 0
+    tr = read(os.path.join(out, '2-178-withfeed.rgp'))
+    assert tr.trace_format == 'bin'
+    assert tr.drill == [round(x, 2) for x in read('tests/data/2-178-withfeed.pdc').drill]
+
+
+def test_convert_errors(tmp_path, read):
+    # traces that read fine but can't be converted are reported and
+    # counted as failures, and don't stop the others
+    import re
+    src = tmp_path/'src'
+    src.mkdir()
+    with open('tests/data/1-131-withfeed-json.rgp', 'rb') as f:
+        data = f.read()
+    # 5 samples short
+    short = re.sub(rb'("drill": \[)((?:[0-9.]+,){5})', rb'\1', data, count=1)
+    (src/'a.rgp').write_bytes(short)
+    # too big for 2 bytes/sample
+    big = re.sub(rb'("drill": \[)[0-9.]+', rb'\g<1>700.00', data, count=1)
+    (src/'b.rgp').write_bytes(big)
+    (src/'c.rgp').write_bytes(data)
+
+    out = tmp_path/'out'
+    assert main(['convert', '-q', '-j', '2', '-f', 'rgp', '-o', str(out), str(src)]) == 1
+    assert sorted(os.listdir(out)) == ['c.rgp']
+    assert read(str(out/'c.rgp')).drill == [round(x, 2) for x in read(str(src/'c.rgp')).drill]
+
+    assert main(['convert', '-q', '-j', '1', '-f', 'compact', '-o', str(out), str(src)]) == 1
+    assert sorted(t.trace_filename for t in load(str(out/'traces.npz'))) == [str(src/'a.rgp'), str(src/'c.rgp')]
+
+    # a location get_latlon() can't parse
+    bad = data.replace(b'some-location', '1.2.3° S, 152.7° E (± 4 m)'.encode('utf-8'))
+    (src/'a.rgp').write_bytes(bad)
+    (src/'b.rgp').write_bytes(data)
+    assert main(['convert', '-q', '-j', '1', '-f', 'parquet', '-o', str(out), str(src)]) == 1
+    assert os.path.exists(str(out/'traces.parquet'))
+
+
+def test_convert_same_name(tmp_path, read):
+    # two inputs that would be written to the same file: the second
+    # fails rather than overwriting the first
+    for d in ('a', 'b'):
+        (tmp_path/d).mkdir()
+    with open('tests/data/1-131-withfeed.rgp', 'rb') as f:
+        (tmp_path/'a'/'x.rgp').write_bytes(f.read())
+    with open('tests/data/2-178-withfeed.pdc', 'rb') as f:
+        (tmp_path/'b'/'x.rgp').write_bytes(f.read())
+    out = tmp_path/'out'
+    assert main(['convert', '-q', '-j', '1', '-o', str(out), str(tmp_path/'a'/'x.rgp'), str(tmp_path/'b'/'x.rgp')]) == 1
+    assert os.listdir(str(out)) == ['x.json']
+    with open(str(out/'x.json')) as f:
+        assert json.load(f) == json.loads(read(str(tmp_path/'a'/'x.rgp')).to_json())
+
+
+def test_main_module():
+    import subprocess
+    import sys
+    p = subprocess.run([sys.executable, '-m', 'imlresi.cli', 'index', '-q', 'tests/data/1-131-withfeed.rgp'],
+                       stdout=subprocess.PIPE)
+    assert p.returncode == 0
+    assert b'PD400-0468' in p.stdout
@@ -0,0 +1,50 @@
+import numpy as np
+from imlresi import trace
+from imlresi.collection import TraceCollection
+
+
+fns = [
+    'tests/data/1-131-withfeed-json.rgp',
+    'tests/data/1-131-withfeed-txt1.txt',
+    'tests/data/2-178-withfeed.pdc',
+    'tests/data/3-131-nofeed.rgp',
+    'tests/data/5-132-withfeed.rgp',
+]
+
+
+def test_TraceCollection(read):
+    trs = [read(fn) for fn in fns]
+    tc = TraceCollection.from_traces(trs[:2], dtype=np.float64)
+    tc.extend(trs[2:])
+    assert len(tc) == len(trs)
+    assert tc.drill.dtype == np.float64
+    for tr, view in zip(trs, tc):
+        assert view.header == tr.header
+        assert view.settings == tr.settings
+        assert view.drill.tolist() == list(tr.drill)
+        assert view.feed.tolist() == list(tr.feed)
+        assert view.trace_format == tr.trace_format
+        assert np.shares_memory(view.drill, tc.drill)
+    assert tc[-1].get_resiId() == 'HVP*6*15'
+
+    # keys only some traces have
+    assert tc.column('abortState') == [3, None, 3, None, None]
+    assert np.isnan(tc.column('abortState', float)[1])
+    assert tc.column('description')[2] == 'TEST 7'
+    assert tc.column('nosuch') == [None]*len(tc)
+    assert np.isnan(tc.column('nosuch', float)).all()
+
+
+def test_TraceCollection_reduce(read):
+    trs = [read(fn) for fn in fns]
+    trs.insert(1, trace.Trace())  # an empty one
+    tc = TraceCollection.from_traces(trs)
+    assert tc.drill.dtype == np.float32
+    peak = tc.reduce(np.maximum)
+    assert np.isnan(peak[1])
+    for tr, p in zip(trs, peak):
+        if len(tr.drill):
+            assert p == np.float32(max(tr.drill))
+    # 3-131-nofeed.rgp has no feed
+    assert np.isnan(tc.reduce(np.add, 'feed')[4])
+    assert (tc.trace_index() == np.repeat(np.arange(len(trs)), tc.drill_lengths)).all()
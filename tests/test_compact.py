@@ -0,0 +1,39 @@
+import pytest
+from imlresi import trace
+from imlresi.compact import CompactTrace, quantise
+
+
+def test_CompactTrace():
+    for fn in (
+            'tests/data/1-131-withfeed-json.rgp',
+            'tests/data/1-131-withfeed.rgp',
+            'tests/data/1-131-withfeed-txt1.txt',
+            'tests/data/1-131-withfeed-txt2.txt',
+            'tests/data/2-178-withfeed.pdc',
+            'tests/data/3-131-nofeed.rgp',
+    ):
+        tr = trace.Trace()
+        tr.read(fn)
+        ct = CompactTrace.read(fn)
+        assert not hasattr(ct, '__dict__')
+        assert ct.header == tr.header
+        assert ct.settings == tr.settings
+        assert ct.drill_counts.itemsize == 2
+        assert ct.drill == [round(x, 2) for x in tr.drill]
+        assert ct.feed == [round(x, 2) for x in tr.feed]
+        assert ct.get_resiId() == tr.get_resiId()
+        assert ct.get_drilltime() == tr.get_drilltime()
+        assert ct.fingerprint() == tr.fingerprint()
+        # raw is re-read only when asked for
+        assert ct._raw is None
+        assert ct.raw == tr.raw
+        assert ct.to_trace().hash() == tr.hash()
+
+
+def test_quantise():
+    assert list(quantise([0., 0.5700000000000001, 655.35])) == [0, 57, 65535]
+    with pytest.raises(ValueError):
+        quantise([0.001])
+    with pytest.raises(ValueError):
+        quantise([-0.01])
+
@@ -0,0 +1,27 @@
+from imlresi.dedup import FingerprintIndex
+
+
+def test_FingerprintIndex(tmp_path, read):
+    fn = str(tmp_path / 'fingerprints.bin')
+    traces = [read(fn) for fn in (
+        'tests/data/1-131-withfeed.rgp',
+        'tests/data/1-131-withfeed-json.rgp',  # same measurement
+        'tests/data/3-131-nofeed.rgp',
+    )]
+    with FingerprintIndex(fn) as index:
+        new = list(index.filter_new(traces))
+        assert new == [traces[0], traces[2]]
+        assert len(index) == 2
+
+    # persisted; a torn last record is dropped
+    with open(fn, 'ab') as f:
+        f.write(b'\x01\x02\x03')
+    with FingerprintIndex(fn) as index:
+        assert len(index) == 2
+        pdc = read('tests/data/2-178-withfeed.pdc')
+        assert index.check([tr.fingerprint() for tr in traces + [pdc]]) == [True, True, True, False]
+        assert index.add(pdc.fingerprint())
+        assert not index.add(pdc.fingerprint())
+    with FingerprintIndex(fn) as index:
+        assert len(index) == 3
+        assert pdc.fingerprint() in index
@@ -0,0 +1,47 @@
+import os
+import shutil
+from imlresi.ingest import ingest, IngestReport, Manifest
+
+
+def test_ingest(tmp_path):
+    src = tmp_path / 'src'
+    shutil.copytree('tests/data', src)
+    manifest = str(tmp_path / 'manifest.json')
+
+    report = IngestReport()
+    res = list(ingest(str(src), manifest, report=report, workers=1))
+    nfiles = len(os.listdir(src))
+    assert len(res) == len(report.new) == nfiles
+    assert len(report.failed) == 1
+    entries = Manifest(manifest).entries
+    assert entries[str(src / '2-178-withfeed.pdc')]['hash'] == 'a07a37875ff4d4a8881b98d386a33be8'
+    assert entries[str(src / '2-178-withfeed.pdc')]['format'] == 'pdc'
+
+    # nothing changed, nothing read
+    report = IngestReport()
+    assert list(ingest(str(src), manifest, report=report, workers=1)) == []
+    assert report.unchanged == nfiles
+
+    os.remove(src / '3-131-nofeed.rgp')
+    shutil.copy(src / '4-131-withfeed.rgp', src / 'new.rgp')
+    with open(src / '5-132-withfeed.rgp', 'ab') as f:
+        f.write(b'\0\0')
+    report = IngestReport()
+    res = list(ingest(str(src), manifest, report=report, workers=1))
+    assert report.new == [str(src / 'new.rgp')]
+    assert report.modified == [str(src / '5-132-withfeed.rgp')]
+    assert report.deleted == [str(src / '3-131-nofeed.rgp')]
+    assert sorted(r.filename for r in res) == report.modified + report.new
+    assert str(src / '3-131-nofeed.rgp') not in Manifest(manifest).entries
+
+
+def test_ingest_resume(tmp_path):
+    manifest = str(tmp_path / 'manifest.json')
+    for res in ingest('tests/data', manifest, checkpoint_every=3, workers=1):
+        if res.filename.endswith('withfeed-txt1.txt'):
+            # interrupted while handling the 4th file; 3 were checkpointed
+            break
+    report = IngestReport()
+    list(ingest('tests/data', manifest, report=report, workers=1))
+    assert report.unchanged == 3
+    assert len(report.new) == len(os.listdir('tests/data')) - 3
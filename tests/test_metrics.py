@@ -0,0 +1,47 @@
+import ujson as json
+from imlresi import metrics, trace
+
+
+def test_disabled():
+    assert metrics.recorder is None
+    tr = trace.Trace()
+    tr.read('tests/data/1-131-withfeed.rgp')
+    assert metrics.recorder is None
+
+
+def test_recording():
+    records = []
+    with metrics.recording() as m:
+        m.add_callback(records.append)
+        for fn in ('tests/data/1-131-withfeed.rgp', 'tests/data/3-131-nofeed.rgp', 'tests/data/2-178-withfeed.pdc'):
+            tr = trace.Trace()
+            tr.read(fn)
+            tr.hash()
+    assert metrics.recorder is None
+
+    assert [r['format'] for r in records] == ['bin', 'bin', 'pdc']
+    assert records[0]['bytes'] == 6882
+    assert set(records[0]['stages']) == {'read_file', 'identify_format', 'decode_samples', 'parse'}
+    assert {'json_escape', 'json_loads'} <= set(records[2]['stages'])
+
+    assert m.counters[('files', 'bin')] == 2
+    assert m.counters[('files', 'pdc')] == 1
+    assert m.counters[('samples', 'pdc')] == len(tr.drill) + len(tr.feed)
+    assert m.histograms[('parse', 'bin')].count == 2
+    assert m.histograms[('hash', 'pdc')].count == 1
+
+    d = json.loads(m.to_json())
+    assert {'name': 'files', 'format': 'bin', 'value': 2} in d['counters']
+
+    prom = m.to_prometheus()
+    assert 'imlresi_files_total{format="bin"} 2\n' in prom
+    assert 'imlresi_stage_seconds_bucket{stage="parse",format="bin",le="+Inf"} 2\n' in prom
+    assert 'imlresi_stage_seconds_count{stage="parse",format="pdc"} 1\n' in prom
+
+
+def test_histogram():
+    h = metrics.Histogram((1., 2.))
+    for x in (0.5, 1., 1.5, 5.):
+        h.observe(x)
+    assert h.counts == [2, 1, 1]
+    assert h.count == 4 and h.sum == 8.
@@ -0,0 +1,53 @@
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+from imlresi import parquet  # noqa: E402
+
+
+def test_parquet_roundtrip(tmp_path, read):
+    trs = [read(fn) for fn in (
+        'tests/data/1-131-withfeed-json.rgp',
+        'tests/data/1-131-withfeed.rgp',
+        'tests/data/1-131-withfeed-txt1.txt',
+        'tests/data/2-178-withfeed.pdc',
+        'tests/data/3-131-nofeed.rgp',
+    )]
+
+    fn = tmp_path / 'traces.parquet'
+    parquet.write_parquet(iter(trs), fn, row_group_size=2)
+    assert parquet.pq.ParquetFile(fn).num_row_groups == 3
+
+    back = list(parquet.iter_parquet(fn))
+    assert len(back) == len(trs)
+    for tr, b in zip(trs, back):
+        assert b.header == tr.header
+        assert b.settings == tr.settings
+        assert b.drill == list(tr.drill)
+        assert b.feed == list(tr.feed)
+        assert b.trace_format == tr.trace_format
+
+    table = pa.parquet.read_table(fn, columns=['drilltime', 'latitude', 'longitude'])
+    assert table['drilltime'][3].as_py().strftime('%Y%m%dT%H:%M:%S') == '20210330T15:20:05'
+    assert table['latitude'][3].as_py() == -26.06952
+    assert table['longitude'][0].as_py() is None
+
+    tc = parquet.read_parquet(fn)
+    assert len(tc) == len(trs)
+    assert tc[3].get_resiId() == 'TEST 7'
+
+
+def test_iter_parquet_row_groups(tmp_path, monkeypatch, read):
+    # row groups are read as they are needed, not merged into batches
+    tr = read('tests/data/1-131-withfeed.rgp')
+    fn = tmp_path / 'traces.parquet'
+    parquet.write_parquet([tr]*5, fn, row_group_size=1)
+    groups = []
+    read_row_group = parquet.pq.ParquetFile.read_row_group
+    monkeypatch.setattr(parquet.pq.ParquetFile, 'read_row_group',
+                        lambda self, i, *args, **kwargs: groups.append(i) or read_row_group(self, i, *args, **kwargs))
+    it = parquet.iter_parquet(fn)
+    next(it)
+    next(it)
+    assert groups == [0, 1]
+    assert len(list(it)) == 3
+    assert groups == [0, 1, 2, 3, 4]
@@ -0,0 +1,101 @@
+from glob import glob
+import io
+import re
+import sqlite3
+
+import ujson as json
+
+from imlresi import pgcopy
+
+
+def unescape(field):
+    # what postgres makes of a COPY text field
+    if field == '\\N':
+        return None
+    return re.sub(r'\\(.)', lambda m: {'t': '\t', 'n': '\n', 'r': '\r'}.get(m.group(1), m.group(1)), field)
+
+
+def load(text, profile):
+    # sqlite standing in for postgres
+    names = [name for name, _ in pgcopy.columns(profile)]
+    db = sqlite3.connect(':memory:')
+    db.execute('CREATE TABLE traces (%s)' % ', '.join('"%s"' % n for n in names))
+    lines = text.split('\n')
+    assert lines.pop() == ''
+    for line in lines:
+        fields = line.split('\t')
+        assert len(fields) == len(names)
+        db.execute('INSERT INTO traces VALUES (%s)' % ','.join('?'*len(names)), [unescape(f) for f in fields])
+    return db
+
+
+def traces(read):
+    return [read(fn, strict=False) for fn in sorted(glob('tests/data/*'))]
+
+
+def test_copy_jsonb(tmp_path, read):
+    trs = traces(read)
+    fn = tmp_path / 'traces.copy'
+    with open(fn, 'w') as f:
+        assert pgcopy.write_copy(iter(trs), f) == len(trs)
+    with open(fn) as f:
+        db = load(f.read(), 'jsonb')
+    rows = db.execute('SELECT hash, fingerprint, trace_format, drilltime, comment, trace FROM traces').fetchall()
+    assert len(rows) == len(trs)
+    for tr, (h, fp, fmt, drilltime, comment, J) in zip(trs, rows):
+        assert h == tr.hash()
+        assert fp == tr.fingerprint()
+        assert fmt == tr.trace_format
+        assert drilltime == tr.get_drilltime().isoformat(' ')
+        assert comment == tr.header['comment']
+        assert json.loads(J) == json.loads(tr.to_json())
+
+    # read in chunks, as psycopg2's copy_expert does
+    stream = pgcopy.CopyStream(iter(trs))
+    chunks = []
+    while True:
+        b = stream.read(8192)
+        if not b:
+            break
+        chunks.append(b)
+    with open(fn) as f:
+        assert b''.join(chunks).decode('utf-8') == f.read()
+
+
+def test_copy_arrays(read):
+    trs = traces(read)
+    f = io.StringIO()
+    pgcopy.write_copy(trs, f, profile='arrays')
+    db = load(f.getvalue(), 'arrays')
+    for tr, (drill, feed) in zip(trs, db.execute('SELECT drill, feed FROM traces')):
+        assert [float(x) for x in drill[1:-1].split(',')] == list(tr.drill)
+        if tr.feed is None:
+            assert feed is None
+        elif len(tr.feed):
+            assert [float(x) for x in feed[1:-1].split(',')] == list(tr.feed)
+
+
+def test_sanitise(read):
+    tr = read('tests/data/1-131-withfeed.rgp')
+    tr.header = dict(tr.header, comment='a\tb\nc\r\\d\x00e', description='TEST\x00 1', name=None)
+    line = pgcopy.row(tr)
+    assert line.endswith('\n') and line.count('\n') == 1
+    assert '\x00' not in line
+    assert '\\u0000' not in line.split('\t')[-1]
+    db = load(line, 'jsonb')
+    comment, description, name, J = db.execute('SELECT comment, description, name, trace FROM traces').fetchone()
+    assert comment == 'a\tb\nc\r\\de'
+    assert description == 'TEST 1'
+    assert name is None
+    assert '\\u0000' in tr.to_json()
+    assert json.loads(J) == json.loads(tr.to_json().replace('\\u0000', ''))
+    assert pgcopy.copy_sql('traces').startswith('COPY traces ("hash", "fingerprint", ')
+    assert 'float8[]' in pgcopy.create_table_sql('traces', 'arrays')
+
+
+def test_row_keeps_cache(read):
+    # the caller's memoised to_json() is left alone
+    tr = read('tests/data/1-131-withfeed.rgp')
+    s = tr.to_json(cache=True)
+    pgcopy.row(tr)
+    assert tr.__dict__['_json'] is s
@@ -0,0 +1,71 @@
+from functools import partial
+
+import numpy as np
+from imlresi import trace
+from imlresi.batch import read_many
+from imlresi.pipeline import Pipeline, stack, smooth, detrend, derivative, rolling_percentile
+
+
+FILENAMES = [
+    'tests/data/1-131-withfeed.rgp',
+    'tests/data/2-178-withfeed.pdc',
+    'tests/data/3-131-nofeed.rgp',
+]
+
+
+def test_stack():
+    x, lengths = stack([[1., 2., 3.], [], None, [4.]])
+    assert list(lengths) == [3, 0, 0, 1]
+    assert x.shape == (4, 3)
+    assert list(x[0]) == [1., 2., 3.]
+    assert x[3, 0] == 4. and np.isnan(x[3, 1:]).all()
+    assert np.isnan(x[1:3]).all()
+
+
+def test_steps():
+    x = np.array([1., 2., 4., 8., 16.])
+    assert np.allclose(smooth(x, 3), [1.5, 7/3, 14/3, 28/3, 12.])
+    assert np.allclose(detrend(2*np.arange(5.) + 3), 0.)
+    assert np.allclose(derivative(x), np.gradient(x))
+    assert np.allclose(derivative(x, 0.5), np.gradient(x, 0.5))
+    assert np.allclose(rolling_percentile(x, 3, 50), [1., 2., 4., 8., 16.])
+
+
+def test_batch_matches_single():
+    # a padded batch gives the same as each profile on its own
+    rng = np.random.default_rng(0)
+    profiles = [rng.random(n) for n in (50, 7, 0, 1, 30)]
+    x, lengths = stack(profiles)
+    for f in (
+            partial(smooth, window=5),
+            detrend,
+            derivative,
+            partial(rolling_percentile, window=7, q=90),
+    ):
+        out = f(x)
+        for p, row, n in zip(profiles, out, lengths):
+            assert np.allclose(row[:n], f(p), equal_nan=True)
+            assert np.isnan(row[n:]).all()
+
+
+def test_rolling_percentile_speed():
+    # a nan padded batch the size stream() makes; nanpercentile() over
+    # the windows took minutes
+    import time
+    rng = np.random.default_rng(0)
+    x, _ = stack([rng.random(n) for n in rng.integers(3000, 4000, 256)])
+    t0 = time.perf_counter()
+    out = rolling_percentile(x, 51, 90)
+    assert time.perf_counter() - t0 < 10
+    assert np.array_equal(np.isnan(out), np.isnan(x))
+
+
+def test_stream():
+    pipe = Pipeline([partial(smooth, window=11), detrend])
+    results = list(pipe.stream(read_many(FILENAMES + ['tests/data/missing.rgp'], workers=1), batch_size=2))
+    assert [r.filename for r, _ in results] == FILENAMES + ['tests/data/missing.rgp']
+    assert results[-1][1] is None
+    for fn, (_, profile) in zip(FILENAMES, results):
+        tr = trace.Trace()
+        tr.read(fn)
+        assert np.allclose(profile, pipe.apply(np.array(tr.drill)))
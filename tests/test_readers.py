@@ -0,0 +1,63 @@
+import subprocess
+import sys
+
+import pytest
+from imlresi import readers, trace
+
+
+# cold-start budget for "import imlresi.trace"
+IMPORT_BUDGET_US = 50000
+
+
+def test_get_reader():
+    assert readers.get_reader('bin') is trace.read_bin
+    assert readers.get_reader('txt2') is trace.read_txt2
+    assert set(readers.BUILTIN) <= set(readers.formats())
+    with pytest.raises(ValueError):
+        readers.get_reader('nosuchformat')
+
+
+def test_register(tmp_path):
+    from imlresi.cache import TraceCache
+
+    def read_upper(fn, header_only=False, data=None):
+        res = trace.read_bin(fn, header_only=header_only, data=data)
+        res['header']['toolserial'] = res['header']['toolserial'].lower()
+        return res
+
+    readers.register('lowerbin', read_upper)
+    try:
+        tr = trace.Trace()
+        tr.read('tests/data/1-131-withfeed.rgp', fmt='lowerbin')
+        assert tr.trace_format == 'lowerbin'
+        assert tr.header['toolserial'] == 'pd400-0468'
+        assert 'lowerbin' in readers.formats()
+
+        # the format read as is part of the cache key
+        cache = TraceCache(tmp_path / 'cache')
+        tr.read('tests/data/1-131-withfeed.rgp', fmt='lowerbin', cache=cache)
+        tr.read('tests/data/1-131-withfeed.rgp', cache=cache)
+        assert tr.trace_format == 'bin'
+        assert tr.header['toolserial'] == 'PD400-0468'
+        tr.read('tests/data/1-131-withfeed.rgp', fmt='lowerbin', cache=cache)
+        assert tr.trace_format == 'lowerbin'
+        assert cache.hits == 1
+    finally:
+        readers._readers.pop('lowerbin')
+
+
+def test_import_is_lazy():
+    # heavy and optional dependencies are only imported when needed
+    out = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import sys, imlresi.trace; print(" ".join(sys.modules))'],
+        capture_output=True, text=True, check=True,
+    )
+    modules = set(out.stdout.split())
+    for name in ('ujson', 'logging', 'numpy', 'matplotlib', 'importlib.metadata'):
+        assert name not in modules
+    cumulative = [
+        int(line.split('|')[1])
+        for line in out.stderr.splitlines()
+        if line.split('|')[-1].strip() == 'imlresi.trace'
+    ]
+    assert cumulative[0] < IMPORT_BUDGET_US
@@ -0,0 +1,74 @@
+import numpy as np
+from imlresi import trace
+from imlresi.collection import TraceCollection
+from imlresi.resample import depth_grid, resample
+
+
+def read_all(read):
+    trs = [read(fn) for fn in (
+        'tests/data/1-131-withfeed.rgp',
+        'tests/data/2-178-withfeed.pdc',
+        'tests/data/3-131-nofeed.rgp',
+    )]
+    # a coarser one
+    tr = trace.Trace()
+    tr.settings = {'samples_per_mm': 2.5, 'drill_depth': 4.}
+    tr.drill = [0., 1., 2., 4., 8., 16., 32., 64., 128., 256.]
+    tr.feed = []
+    trs.append(tr)
+    return trs
+
+
+def test_get_depth(read):
+    tr = read('tests/data/1-131-withfeed.rgp')
+    depth = tr.get_depth()
+    assert len(depth) == len(tr.drill)
+    assert depth[10] == 1.
+    assert np.allclose(np.diff(depth), 0.1)
+
+
+def test_resample_linear(read):
+    trs = read_all(read)
+    tc = TraceCollection.from_traces(trs, dtype=float)
+    grid = depth_grid(tc, step=0.3)
+    assert grid[-1] <= 441.3 < grid[-1] + 0.3
+    X = resample(tc, grid)
+    assert X.shape == (len(trs), len(grid))
+    for tr, x in zip(trs, X):
+        depth = tr.get_depth()
+        inside = grid <= depth[-1]
+        assert np.allclose(x[inside], np.interp(grid[inside], depth, tr.drill))
+        assert np.isnan(x[~inside]).all()
+    F = resample(trs, grid, channel='feed')
+    assert np.isnan(F[2:]).all()
+
+
+def test_resample_mean(read):
+    trs = read_all(read)
+    grid = np.arange(0., 50., 2.)
+    X = resample(trs, grid, method='mean')
+    for tr, x in zip(trs, X):
+        depth = tr.get_depth()
+        drill = np.array(tr.drill)
+        for j, g in enumerate(grid):
+            inbin = (depth >= g) & (depth < g + 2.)
+            if inbin.any():
+                assert np.isclose(x[j], drill[inbin].mean())
+            else:
+                assert np.isnan(x[j])
+
+
+def test_resample_empty(read):
+    grid = depth_grid([])
+    assert list(grid) == [0.]
+    for method in ('linear', 'mean'):
+        assert resample([], grid, method=method).shape == (0, 1)
+        assert resample([], [], method=method).shape == (0, 0)
+
+    # samples_per_mm missing from every trace: taken from drill_depth
+    tr = read('tests/data/3-131-nofeed.rgp')
+    tr.settings = {k: v for k, v in tr.settings.items() if k != 'samples_per_mm'}
+    grid = depth_grid([tr])
+    X = resample([tr], grid)
+    assert X.shape == (1, len(grid))
+    assert np.isclose(X[0, 0], tr.drill[0])
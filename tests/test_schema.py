@@ -0,0 +1,16 @@
+from imlresi.schema import ROW_FIELDS, row_values
+
+
+def test_row_values(read):
+    for fn in (
+            'tests/data/1-131-withfeed-json.rgp',
+            'tests/data/1-131-withfeed.rgp',
+            'tests/data/2-178-withfeed.pdc',
+    ):
+        tr = read(fn)
+        values = row_values(tr)
+        assert list(values) == [k for k, _ in ROW_FIELDS]
+        assert values['drilltime'] == tr.get_drilltime()
+        for k, t in ROW_FIELDS:
+            # .pdc true/false come out as ints
+            assert values[k] is None or type(values[k]) is t or t is float
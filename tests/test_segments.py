@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+from imlresi.segments import find_segments, hysteresis, per_trace
+
+
+def test_hysteresis():
+    x = np.array([[1., .4, .6, .4, .8, .6, np.nan, .4]])
+    assert hysteresis(x, .5, .7).tolist() == [[False, True, True, True, False, False, False, True]]
+
+
+def test_find_segments():
+    grid = np.arange(0., 100., 1.)
+    X = np.full((3, len(grid)), 50.)
+    X[:, :2] = 0.  # air
+    X[:, 2:6] = 20.  # bark
+    X[0, 40:60] = 15.  # decay...
+    X[0, 45:50] = 1.  # ...with a cavity
+    X[0, 52] = 30.  # noise that doesn't end the decay
+    X[1, 80:] = np.nan  # a shorter trace, no defects
+    X[1, 70:72] = 10.  # too short to count
+    X[2] = np.nan  # an empty trace
+    segs = find_segments(X, grid)
+    assert per_trace(segs, 3) == [
+        [(2., 6., 'bark'), (40., 60., 'decay'), (45., 50., 'cavity')],
+        [(2., 6., 'bark')],
+        [],
+    ]
+    segs = find_segments(X, grid, {'cavity': {'min_mm': 10.}})
+    assert per_trace(segs, 3) == [[], [], []]
+    with pytest.raises(ValueError):
+        find_segments(X, grid, {'knot': {}})
+
+
+def test_find_segments_empty():
+    # an empty grid, as resample() gives for traces with no samples
+    for X in (np.zeros((2, 0)), np.zeros((0, 0))):
+        segs = find_segments(X, np.zeros(0))
+        assert all(len(c) == 0 for c in segs)
+        assert per_trace(segs, len(X)) == [[]]*len(X)
+    with pytest.raises(ValueError):
+        find_segments(np.zeros((2, 0)), [], {'knot': {}})
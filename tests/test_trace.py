@@ -12,6 +12,29 @@ def test_identify_format():
     assert trace.identify_format('tests/data/2-178-withfeed.pdc') == 'pdc'
 
 
+def test_identify_format_from_data():
+    for fn, fmt in (
+            ('tests/data/1-131-withfeed-json.rgp', 'json'),
+            ('tests/data/1-131-withfeed.rgp', 'bin'),
+            ('tests/data/1-131-withfeed-txt1.txt', 'txt1'),
+            ('tests/data/1-131-withfeed-txt2.txt', 'txt2'),
+            ('tests/data/2-178-withfeed.pdc', 'pdc'),
+    ):
+        with open(fn, 'rb') as f:
+            data = f.read()
+        assert trace.identify_format(None, data) == fmt
+        # pushing the keys out of the sniffed prefix forces a full parse
+        assert trace.identify_format(None, data[:200] + b' '*trace.SNIFF_BYTES + data[200:]) == fmt
+
+    # a "dateTime" outside "header" doesn't make a json .rgp a .pdc
+    with open('tests/data/1-131-withfeed-json.rgp', 'rb') as f:
+        data = f.read()
+    data = data.replace(b'"app":\n{', b'"app":\n{"dateTime": "20170302-14:39:14",', 1)
+    assert b'"dateTime"' in data
+    assert trace.identify_format(None, data) == 'json'
+    assert trace.identify_format(None, data[:200] + b' '*trace.SNIFF_BYTES + data[200:]) == 'json'
+
+
 # test individual format trace parsers
 def test_read_xxx():
     # compare the dicts returned by each of the different read formats
@@ -51,6 +74,20 @@ def test_read_xxx():
     # todo: add .pdc format to the comparisons
 
 
+def test_read_bin_as_array():
+    for fn in (
+            'tests/data/1-131-withfeed.rgp',
+            'tests/data/3-131-nofeed.rgp',
+            'tests/data/5-132-withfeed.rgp',
+    ):
+        lst = trace.read_bin(fn)
+        arr = trace.read_bin(fn, as_array=True)
+        assert arr['drill'].tolist() == lst['drill']
+        assert arr['feed'].tolist() == lst['feed']
+        assert arr['header'] == lst['header']
+        assert arr['settings'] == lst['settings']
+
+
 
 
 
@@ -112,6 +149,60 @@ def test_Trace():
         assert tr.header['location']==loc
 
 
+def test_read_header_only():
+    import re
+    import pytest
+    for fn in (
+            'tests/data/1-131-withfeed-json.rgp',
+            'tests/data/1-131-withfeed.rgp',
+            'tests/data/1-131-withfeed-txt1.txt',
+            'tests/data/1-131-withfeed-txt2.txt',
+            'tests/data/2-178-withfeed.pdc',
+    ):
+        full = trace.Trace()
+        full.read(fn)
+        tr = trace.Trace()
+        tr.read(fn, header_only=True)
+        assert tr.header == full.header
+        assert tr.settings == full.settings
+        assert tr.drill == [] and tr.feed == []
+        assert tr.raw is None
+        # there's nothing to hash
+        with pytest.raises(ValueError):
+            tr.hash()
+
+    # a string value "profile" isn't the key
+    with open('tests/data/2-178-withfeed.pdc', 'rb') as f:
+        data = f.read()
+    data = re.sub(rb'"name": "[^"]*"', b'"name": "profile"', data, count=1)
+    full = trace.Trace()
+    full.read(None, data=data)
+    tr = trace.Trace()
+    tr.read(None, data=data, header_only=True)
+    assert tr.header == full.header
+    assert tr.header['name'] == 'profile'
+
+
+def test_fingerprint():
+    # the same measurement in every format it's been exported to
+    fps = set()
+    for fn in (
+            'tests/data/1-131-withfeed-json.rgp',
+            'tests/data/1-131-withfeed.rgp',
+            'tests/data/1-131-withfeed-txt1.txt',
+            'tests/data/1-131-withfeed-txt2.txt',
+            'tests/data/1-131-withfeed-pdtools122.rgp',
+            'tests/data/1-131-withfeed-pdtools167.rgp',
+    ):
+        tr = trace.Trace()
+        tr.read(fn)
+        fps.add(tr.fingerprint())
+    assert fps == {'fe2913412b952365cc7e5a3b27f35f83'}
+
+    tr.read('tests/data/4-131-withfeed.rgp')
+    assert tr.fingerprint() != 'fe2913412b952365cc7e5a3b27f35f83'
+
+
 def test_accessors():
     from datetime import datetime
     tr = trace.Trace()
@@ -137,4 +228,184 @@ def test_accessors():
 # todo: test Trace.__repr__()
 
 
-# todo: test Trace.to_json()
+def test_to_json():
+    import io
+    import ujson
+    for fn in (
+            'tests/data/1-131-withfeed-json.rgp',
+            'tests/data/1-131-withfeed.rgp',
+            'tests/data/1-131-withfeed-txt1.txt',
+            'tests/data/2-178-withfeed.pdc',
+            'tests/data/3-131-nofeed.rgp',
+    ):
+        tr = trace.Trace()
+        tr.read(fn)
+        if tr.trace_format in ('json', 'pdc'):
+            J = ujson.loads(tr.raw)
+        else:
+            J = trace.create_jdata(
+                trace.JSON_HEADER_MAP,
+                {**tr.header, **tr.settings},
+                {'drill': tr.drill, 'feed': tr.feed},
+            )
+        s = tr.to_json()
+        assert s == ujson.dumps(J)
+        assert tr.to_json(cache=True) == s
+        assert tr.to_json(cache=True) is tr.to_json(cache=True)  # memoised
+        f = io.StringIO()
+        tr.write_json(f)
+        assert f.getvalue() == s
+
+    assert ''.join(trace.dump_floats(tr.drill, chunksize=7)) == ujson.dumps(tr.drill)
+
+    # by default every change counts, in place or not
+    h = tr.hash()
+    last = tr.drill[-1]
+    tr.drill[-1] = last + 1
+    assert tr.hash() != h
+    tr.drill[-1] = last
+    tr.header['description'] = 'X'
+    assert tr.hash() != h
+    # with cache=True reassigning invalidates the memo, in place
+    # changes need touch()
+    tr2 = trace.Trace()
+    tr2.read('tests/data/3-131-nofeed.rgp')
+    h = tr2.hash(cache=True)
+    last = tr2.drill[-1]
+    tr2.drill = tr2.drill[:-1]
+    assert tr2.hash(cache=True) != h
+    tr2.drill.append(last)
+    assert tr2.hash(cache=True) != h
+    tr2.touch()
+    assert tr2.hash(cache=True) == h
+
+
+def test_to_rgp_bin():
+    import pytest
+    # a binary trace gives back its file
+    for fn in (
+            'tests/data/1-131-withfeed.rgp',
+            'tests/data/3-131-nofeed.rgp',
+            'tests/data/5-132-withfeed.rgp',
+    ):
+        tr = trace.Trace()
+        tr.read(fn)
+        assert tr.to_rgp_bin() == tr.raw
+
+    # others round trip through read_bin
+    for fn in (
+            'tests/data/1-131-withfeed-json.rgp',
+            'tests/data/1-131-withfeed-txt1.txt',
+            'tests/data/1-131-withfeed-txt2.txt',
+            'tests/data/2-178-withfeed.pdc',
+    ):
+        tr = trace.Trace()
+        tr.read(fn)
+        b = tr.to_rgp_bin()
+        assert len(b) < len(tr.raw)/2
+        tr2 = trace.Trace()
+        tr2.read(fn, data=b)
+        assert tr2.trace_format == 'bin'
+        assert tr2.to_rgp_bin() == b
+        assert tr2.drill == [round(x, 2) for x in tr.drill]
+        assert tr2.feed == [round(x, 2) for x in tr.feed]
+        for k, v in tr2.settings.items():
+            assert v == (tr.settings[k] or 0)
+
+    tr.drill = tr.drill[:-1]
+    with pytest.raises(ValueError):
+        tr.to_rgp_bin()
+    tr.drill = tr.drill + [0.001]
+    with pytest.raises(ValueError):
+        tr.to_rgp_bin()
+    tr.drill = tr.drill[:-1] + [700.]
+    with pytest.raises(ValueError):
+        tr.to_rgp_bin()
+
+
+def test_read_txt_bulk():
+    import pytest
+    # the bulk parsing of the sample section gives exactly what
+    # parsing line by line does, falling back to it for the files it
+    # can't take
+    def by_line(data, fmt):
+        lines = [line.strip() for line in data.decode().splitlines()]
+        if fmt == 'txt2':
+            return lines, [float(x) for x in lines[252].split(',')], [float(x) for x in lines[253].split(',')]
+        if ';' in lines[129]:
+            return lines, [float(l.split(';')[0])/100. for l in lines[129:]], [float(l.split(';')[1])/100. for l in lines[129:]]
+        return lines, [int(x)/100. for x in lines[129:]], None
+
+    with open('tests/data/1-131-withfeed-txt1.txt', 'rb') as f:
+        txt1 = f.read()
+    with open('tests/data/1-131-withfeed-txt2.txt', 'rb') as f:
+        txt2 = f.read()
+    head = b'\n'.join(txt1.split(b'\n')[:129])
+    nofeed = head + b'\n' + b'\n'.join(l.split(b';')[0] for l in txt1.split(b'\n')[129:])
+    for data, fmt in (
+            (txt1, 'txt1'),
+            (txt1.rstrip(b'\n'), 'txt1'),
+            (nofeed, 'txt1'),
+            (txt1.replace(b'\n', b'\r\n'), 'txt1'),
+            (txt1.replace(b';', b' ; ', 1), 'txt1'),
+            (txt1.replace(b'\n', b' \n', 3), 'txt1'),
+            (txt2, 'txt2'),
+            (txt2.replace(b'\n', b'\r\n'), 'txt2'),
+    ):
+        res = getattr(trace, 'read_' + fmt)(None, data=data)
+        lines, drill, feed = by_line(data, fmt)
+        assert res['raw'] == '\n'.join(lines)
+        assert res['drill'] == drill
+        assert res['feed'] == feed
+        assert all(type(x) is float for x in res['drill'])
+
+    # a malformed sample line still raises
+    with pytest.raises(ValueError):
+        trace.read_txt1(None, data=txt1.replace(b';', b';;', 1))
+    # so does one with two ; and another with none, though the counts add up
+    body = txt1.split(b'\n')
+    body[130] = body[130] + b';1'
+    body[131] = body[131].split(b';')[0]
+    with pytest.raises(ValueError, match='too many values'):
+        trace.read_txt1(None, data=b'\n'.join(body))
+
+
+def test_read_from_memory():
+    import io
+    for fn in (
+            'tests/data/1-131-withfeed-json.rgp',
+            'tests/data/1-131-withfeed.rgp',
+            'tests/data/1-131-withfeed-txt1.txt',
+            'tests/data/1-131-withfeed-txt2.txt',
+            'tests/data/2-178-withfeed.pdc',
+    ):
+        tr = trace.Trace()
+        tr.read(fn)
+        with open(fn, 'rb') as f:
+            data = f.read()
+        assert trace.identify_format(io.BytesIO(data)) == tr.trace_format
+        for source in (data, bytearray(data), memoryview(data), memoryview(b'--' + data)[2:], io.BytesIO(data)):
+            tr2 = trace.Trace()
+            tr2.read(source)
+            assert tr2.trace_filename is None
+            assert tr2.trace_format == tr.trace_format
+            assert tr2.raw == tr.raw
+            assert tr2.to_json() == tr.to_json()
+        with open(fn, 'rb') as f:
+            tr2 = trace.Trace()
+            tr2.read(f)
+        assert tr2.trace_filename == fn
+        assert tr2.to_json() == tr.to_json()
+
+    # bytes, or a view of all of them, are used without copying
+    with open('tests/data/1-131-withfeed.rgp', 'rb') as f:
+        data = f.read()
+    assert trace.read_bin(data)['raw'] is data
+    assert trace.read_bin(None, data=memoryview(data))['raw'] is data
+    assert trace.as_bytes(memoryview(data)) is data
+    # but not a buffer that may change under the trace
+    buf = bytearray(data)
+    tr = trace.Trace()
+    tr.read(buf)
+    buf[-2:] = b'\xff\xff'
+    assert tr.raw == data